@@ -1,3 +1,14 @@
 from .state import Rotation, Sequence, Transition
-from .windows.focus_hook import FocusHook
-from .windows.screen import get_screen_by_window_title
+
+
+# The Windows hooks are only importable on Windows, load them on first use so the rest of core runs anywhere
+def __getattr__(name):
+    if name == 'FocusHook':
+        from .windows.focus_hook import FocusHook
+        return FocusHook
+
+    if name == 'get_screen_by_window_title':
+        from .windows.screen import get_screen_by_window_title
+        return get_screen_by_window_title
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
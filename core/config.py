@@ -1,9 +1,23 @@
 import configparser
+import io
+import json
+
+from .constants import INTERFACE_SIZE_SCALES
+from .utils import atomic_write
 
 _raw_controls = None
 controls = None
+# Game resolution override, None uses the resolution of the monitor the game is on
 resolution = None
+interface_size = 'normal'
 rotation_file_path = None
+rotation_library_path = None
+autosave = False
+trace_latency = False
+
+# Resolving a key through keyboard builds its whole key table on first use, so resolved scan codes are kept
+# next to settings.ini for the keyboard layout they were resolved with
+SCAN_CODE_CACHE_FILE = 'scan_codes.json'
 
 
 def load():
@@ -14,15 +28,36 @@ def load():
         global controls
         global _raw_controls
         _raw_controls = config['Controls']
-        controls = [_parse_controls(key, value) for key, value in config['Controls'].items()]
+
+        scan_code_cache = _load_scan_code_cache()
+        cached_keys = len(scan_code_cache)
+        controls = [_parse_controls(key, value, scan_code_cache) for key, value in config['Controls'].items()]
+
+        if len(scan_code_cache) != cached_keys:
+            _save_scan_code_cache(scan_code_cache)
 
     if 'Resolution' in config:
         global resolution
-        resolution = [config.getint('Resolution', 'width'), config.getint('Resolution', 'height')]
+        global interface_size
+        # Left empty unless the game runs at a different resolution than its monitor, e.g. windowed
+        width = config['Resolution'].get('width', '').strip()
+        height = config['Resolution'].get('height', '').strip()
+        resolution = [int(width), int(height)] if width and height else None
+
+        interface_size = config['Resolution'].get('interface_size', 'normal').lower()
+        if interface_size not in INTERFACE_SIZE_SCALES:
+            print(f"Unknown interface size {interface_size}, using normal")
+            interface_size = 'normal'
 
     if 'Settings' in config:
         global rotation_file_path
+        global rotation_library_path
+        global autosave
+        global trace_latency
         rotation_file_path = config['Settings'].get('rotation_file_path', None)
+        rotation_library_path = config['Settings'].get('rotation_library_path', None)
+        autosave = config['Settings'].getboolean('autosave', False)
+        trace_latency = config['Settings'].getboolean('trace_latency', False)
 
 
 def save():
@@ -31,14 +66,31 @@ def save():
     if _raw_controls is not None:
         config['Controls'] = _raw_controls
 
-    if resolution is not None:
-        config['Resolution'] = {'width': str(resolution[0]), 'height': str(resolution[1])}
+    config['Resolution'] = {
+        'width': str(resolution[0]) if resolution is not None else '',
+        'height': str(resolution[1]) if resolution is not None else ''
+    }
+
+    if interface_size != 'normal':
+        config['Resolution']['interface_size'] = interface_size
+
+    config['Settings'] = {}
 
     if rotation_file_path is not None:
-        config['Settings'] = {'rotation_file_path': rotation_file_path}
+        config['Settings']['rotation_file_path'] = rotation_file_path
+
+    if rotation_library_path is not None:
+        config['Settings']['rotation_library_path'] = rotation_library_path
+
+    if autosave:
+        config['Settings']['autosave'] = 'true'
+
+    if trace_latency:
+        config['Settings']['trace_latency'] = 'true'
 
-    with open('settings.ini', 'w') as configfile:
-        config.write(configfile)
+    configfile = io.StringIO()
+    config.write(configfile)
+    atomic_write('settings.ini', configfile.getvalue())
 
 
 class Control:
@@ -48,8 +100,41 @@ class Control:
         self.scan_codes = key
 
 
-def _parse_controls(name, hotkey_string):
-    import keyboard
+def _keyboard_layout():
+    try:
+        from .windows.keyboard_layout import get_keyboard_layout
+    except (ImportError, AttributeError):
+        # No layout to key the cache by outside of Windows
+        return 'default'
+
+    return get_keyboard_layout()
+
+
+def _load_scan_code_cache():
+    try:
+        with open(SCAN_CODE_CACHE_FILE, 'r') as file:
+            data = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+    if not isinstance(data, dict) or data.get('layout') != _keyboard_layout():
+        return {}
+
+    return {key: tuple(scan_codes) for key, scan_codes in data.get('scan_codes', {}).items()}
+
+
+def _save_scan_code_cache(scan_code_cache):
+    data = {'layout': _keyboard_layout(), 'scan_codes': {key: list(scan_codes) for key, scan_codes in scan_code_cache.items()}}
+
+    try:
+        atomic_write(SCAN_CODE_CACHE_FILE, json.dumps(data, indent=4))
+    except OSError as e:
+        print(f"Failed to write {SCAN_CODE_CACHE_FILE}: {e}")
+
+
+def _parse_controls(name, hotkey_string, scan_code_cache=None):
+    if scan_code_cache is None:
+        scan_code_cache = {}
 
     modifiers = set()
     scan_codes = None
@@ -58,7 +143,10 @@ def _parse_controls(name, hotkey_string):
         if key in {"ctrl", "shift", "alt", "cmd"}:
             modifiers.add(key)
         else:
-            scan_codes = keyboard.key_to_scan_codes(key)
+            scan_codes = scan_code_cache.get(key)
+            if scan_codes is None:
+                import keyboard
+                scan_codes = scan_code_cache[key] = tuple(keyboard.key_to_scan_codes(key))
 
     return Control(name, modifiers, scan_codes)
 
@@ -20,21 +20,48 @@ _BASE_ACTION_HIGHLIGHTS = {
     'profession_skill_3': [1128, 1296, 40, 40],
 }
 
-ACTION_HIGHLIGHTS = {}
+# Top left of the sequence label, which sits to the left of the weapon swap slot
+_BASE_SEQUENCE_LABEL_POSITION = [807, 1366]
+_BASE_SEQUENCE_LABEL_WIDTH = 100
+
+# The base regions were measured with the interface size set to normal. Larger interface sizes grow the skill bar
+# around its anchor at the bottom centre of the screen.
+INTERFACE_SIZE_SCALES = {
+    'small': 0.9,
+    'normal': 1.0,
+    'large': 1.11,
+    'larger': 1.22,
+}
 
 ACTION_NAMES = list(_BASE_ACTION_HIGHLIGHTS.keys())
+ACTION_IDS = {name: action_id for action_id, name in enumerate(ACTION_NAMES)}
+
+
+def _scale_point(x, y, width, height, interface_size):
+    # The game scales its interface with the screen height only and keeps the skill bar at the bottom centre, wider
+    # or narrower screens than the base resolution just get more or less room on the sides
+    base_width, base_height = _ACTION_HIGHLIGHTS_BASE_RESOLUTION
+    scale = INTERFACE_SIZE_SCALES[interface_size] * height / base_height
+
+    return width / 2 + (x - base_width / 2) * scale, height + (y - base_height) * scale
+
+
+def calculate_highlight_regions(width, height, interface_size='normal'):
+    # Regions indexed by ACTION_IDS, as integer (x, y, width, height) for a screen of the given size
+    scale = INTERFACE_SIZE_SCALES[interface_size] * height / _ACTION_HIGHLIGHTS_BASE_RESOLUTION[1]
+
+    regions = []
+    for name in ACTION_NAMES:
+        x, y, region_width, region_height = _BASE_ACTION_HIGHLIGHTS[name]
+        left, top = _scale_point(x, y, width, height, interface_size)
+        regions.append((round(left), round(top), round(region_width * scale), round(region_height * scale)))
+
+    return regions
 
 
-def calculate_highlight_regions(width, height):
-    width_ratio = _ACTION_HIGHLIGHTS_BASE_RESOLUTION[0] / width
-    height_ratio = _ACTION_HIGHLIGHTS_BASE_RESOLUTION[1] / height
+def calculate_label_anchor(width, height, interface_size='normal'):
+    # Right edge and top of the sequence label, the label grows to the left as its text gets longer
+    x, y = _BASE_SEQUENCE_LABEL_POSITION
+    right, top = _scale_point(x + _BASE_SEQUENCE_LABEL_WIDTH, y, width, height, interface_size)
 
-    global ACTION_HIGHLIGHTS
-    ACTION_HIGHLIGHTS = {
-        key: [
-            _BASE_ACTION_HIGHLIGHTS[key][0] * width_ratio,
-            _BASE_ACTION_HIGHLIGHTS[key][1] * height_ratio,
-            _BASE_ACTION_HIGHLIGHTS[key][2] * width_ratio,
-            _BASE_ACTION_HIGHLIGHTS[key][3] * height_ratio
-        ] for key in _BASE_ACTION_HIGHLIGHTS.keys()
-    }
+    return round(right), round(top)
@@ -1,19 +1,31 @@
-import pickle
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import atexit
+import threading
 
 
-CACHE_FILE = 'cache.pkl'
+# Importing this module does no I/O, requests is imported on the first network call and the cache is
+# opened on the first lookup
+CACHE_FILE = 'cache.sqlite3'
 
+# Can be pointed at a local server for testing
+API_URL = 'https://api.guildwars2.com'
 
-_cache = {
-    'skills': {},
-    'professions': {}
-}
+# Upper limit the API accepts for the ids= parameter
+MAX_IDS_PER_REQUEST = 200
 
+# Connections kept alive per host, enough for a handful of worker threads fetching at once
+POOL_SIZE = 10
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def create_session(max_retries=5, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                    respect_retry_after_header=True):
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
 
-def _fetch(url, max_retries=5, backoff_factor=0.5):
     session = requests.Session()
 
     retry = Retry(
@@ -21,93 +33,193 @@ def _fetch(url, max_retries=5, backoff_factor=0.5):
         read=max_retries,
         connect=max_retries,
         backoff_factor=backoff_factor,
-        status_forcelist=[429, 500, 502, 503, 504],
+        status_forcelist=status_forcelist,
+        respect_retry_after_header=respect_retry_after_header,
     )
 
-    adapter = HTTPAdapter(max_retries=retry)
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
     session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return session
+
+
+class LazySession(object):
+    # A session created on first use with the given create_session() options. The connection pool underneath is
+    # thread safe, one session is shared by every thread.
+    def __init__(self, **options):
+        self._options = options
+        self._session = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = create_session(**self._options)
+
+        return self._session
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+_session = LazySession()
+
+
+def get_cache():
+    global _cache
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                from .cache import Cache
+                _cache = Cache(CACHE_FILE)
+
+    return _cache
+
+
+def close():
+    global _cache
+
+    _session.close()
+
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+            _cache = None
+
+
+def _fetch(url):
+    import requests
 
     try:
-        response = session.get(url)
+        response = _session.get().get(url)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
         raise Exception(f"Failed to fetch data from {url}: {e}")
 
 
-def _fetch_professions():
-    url = "https://api.guildwars2.com/v2/professions?ids=all&v=2019-12-19T00:00:00Z"
-    professions = _fetch(url)
+def professions_url():
+    return f"{API_URL}/v2/professions?ids=all&v=2019-12-19T00:00:00Z"
+
+
+def ids_url(endpoint, ids):
+    return f"{API_URL}/v2/{endpoint}?ids={','.join(str(entity_id) for entity_id in ids)}"
+
 
-    # Transform skills_by_palette tuple array to dictionary for easier palette to skill conversion
-    for profession_key in professions.keys():
-        profession = professions[profession_key]
-        profession['skills_by_palette'] = {pair[0]: pair[1] for pair in profession['skills_by_palette']}
+def chunk_ids(ids):
+    return [ids[start:start + MAX_IDS_PER_REQUEST] for start in range(0, len(ids), MAX_IDS_PER_REQUEST)]
 
-    return professions
+
+def index_palette(profession):
+    # Palette <-> skill maps are built once and stored with the cached profession
+    if 'palettes_by_skill' in profession:
+        return profession
+
+    skills_by_palette = profession['skills_by_palette']
+    if not isinstance(skills_by_palette, dict):
+        skills_by_palette = profession['skills_by_palette'] = {pair[0]: pair[1] for pair in skills_by_palette}
+
+    palettes_by_skill = {}
+    for palette_id, skill_id in skills_by_palette.items():
+        # Several palette ids can share a skill, the first one is used when encoding
+        palettes_by_skill.setdefault(skill_id, palette_id)
+
+    profession['palettes_by_skill'] = palettes_by_skill
+    return profession
+
+
+def prepare_professions(professions):
+    for profession in professions:
+        index_palette(profession)
+
+    return {profession['code']: profession for profession in professions}
+
+
+def _fetch_professions():
+    return prepare_professions(_fetch(professions_url()))
 
 
 def _fetch_skill(skill_id):
-    url = f"https://api.guildwars2.com/v2/skills?id={skill_id}"
+    url = f"{API_URL}/v2/skills?id={skill_id}"
     return _fetch(url)
 
 
-def _save_cache():
-    global _cache
+def get_skill(skill_id, use_cache=True):
+    cache = get_cache()
+    skill = cache.get('skills', skill_id) if use_cache else None
 
-    with open(CACHE_FILE, 'wb') as f:
-        pickle.dump(_cache, f)
+    if skill is None:
+        skill = _fetch_skill(skill_id)
+        cache.put('skills', skill_id, skill)
 
+    return skill
 
-def _load_cache():
-    global _cache
 
-    try:
-        with open(CACHE_FILE, 'rb') as f:
-            _cache = pickle.load(f)
-    except FileNotFoundError:
-        # Initializes as default cache structure, can ignore FileNotFoundError
-        pass
+def _get_many(endpoint, ids, use_cache=True):
+    ids = list(dict.fromkeys(ids))
 
+    # Every ids= endpoint is cached in the table of the same name
+    cache = get_cache()
+    entities = cache.get_many(endpoint, ids) if use_cache else {}
+    missing = [entity_id for entity_id in ids if entity_id not in entities]
 
-def get_skill(skill_id, use_cache=True):
-    global _cache
+    fetched = {}
+    for chunk in chunk_ids(missing):
+        for entity in _fetch(ids_url(endpoint, chunk)):
+            fetched[entity['id']] = entity
 
-    skill_cache = _cache['skills']
+    if fetched:
+        cache.put_many(endpoint, fetched)
+        entities.update(fetched)
 
-    if skill_id not in skill_cache or not use_cache:
-        skill_cache[skill_id] = _fetch_skill(skill_id)
-        _save_cache()
+    # Ids unknown to the API are left out
+    return entities
 
-    return skill_cache[skill_id]
 
+def get_skills(skill_ids, use_cache=True):
+    return _get_many('skills', skill_ids, use_cache)
 
-def get_profession(profession_id, use_cache=True):
-    global _cache
 
-    profession_cache = _cache['professions']
+def get_specializations(specialization_ids, use_cache=True):
+    return _get_many('specializations', specialization_ids, use_cache)
+
+
+def get_traits(trait_ids, use_cache=True):
+    return _get_many('traits', trait_ids, use_cache)
+
 
-    if not profession_cache or not use_cache:
+def get_profession(profession_id, use_cache=True):
+    cache = get_cache()
+    profession = cache.get('professions', profession_id) if use_cache else None
+
+    if profession is None:
+        # Professions are only served all at once, store every one of them while we have them
         professions = _fetch_professions()
-        for profession in professions:
-            profession_cache[profession['code']] = profession
-        _save_cache()
+        cache.put_many('professions', professions)
+        profession = professions[profession_id]
 
-    return profession_cache[profession_id]
+    # Entries cached before the reverse map existed get it on first use
+    return index_palette(profession)
 
 
-def skill_id_to_palette_id(skill_id, profession_id):
-    skills_by_palette = get_profession(profession_id)['skills_by_palette']
+def palette_ids_to_skill_ids(profession, palette_ids):
+    # Empty slots and palette ids the profession doesn't have are left out
+    skills_by_palette = profession['skills_by_palette']
+    return [skills_by_palette[palette_id] for palette_id in palette_ids if palette_id in skills_by_palette]
 
-    return next((_palette_id for _skill_id, _palette_id in skills_by_palette.items() if _skill_id == skill_id), None)
+
+def skill_id_to_palette_id(skill_id, profession_id):
+    return get_profession(profession_id)['palettes_by_skill'].get(skill_id)
 
 
 def palette_id_to_skill_id(palette_id, profession_id):
-    profession = get_profession(profession_id)
-    try:
-        return profession['skills_by_palette'][palette_id]
-    except KeyError:
-        return None
+    return get_profession(profession_id)['skills_by_palette'].get(palette_id)
 
 
-_load_cache()
+atexit.register(close)
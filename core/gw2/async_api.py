@@ -0,0 +1,165 @@
+import asyncio
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from . import api
+
+
+# Requests allowed on the wire at once, kept below api.POOL_SIZE so every request gets a pooled connection
+MAX_IN_FLIGHT = 6
+
+MAX_ATTEMPTS = 6
+BACKOFF_FACTOR = 0.5
+
+
+# Rate limiting is handled by the client below, the adapter only retries connection and server errors
+_session = api.LazySession(status_forcelist=(500, 502, 503, 504), respect_retry_after_header=False)
+
+# Runs the prefetch event loops so callers on the GUI thread never block
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gw2-prefetch')
+
+
+def close():
+    _executor.shutdown(wait=False, cancel_futures=True)
+    _session.close()
+
+
+class AsyncClient(object):
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT):
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._professions_lock = asyncio.Lock()
+
+        # A 429 pauses every request of this client, not just the one that received it
+        self._rate_limited_until = 0.0
+
+    async def _wait_for_rate_limit(self):
+        loop = asyncio.get_running_loop()
+
+        while (delay := self._rate_limited_until - loop.time()) > 0:
+            await asyncio.sleep(delay)
+
+    async def _fetch(self, url):
+        loop = asyncio.get_running_loop()
+        session = _session.get()
+
+        for attempt in range(MAX_ATTEMPTS):
+            await self._wait_for_rate_limit()
+
+            async with self._semaphore:
+                try:
+                    response = await loop.run_in_executor(None, session.get, url)
+                except requests.exceptions.RequestException as e:
+                    raise Exception(f"Failed to fetch data from {url}: {e}")
+
+            if response.status_code == 429:
+                try:
+                    delay = float(response.headers['Retry-After'])
+                except (KeyError, ValueError):
+                    delay = BACKOFF_FACTOR * (2 ** attempt)
+
+                self._rate_limited_until = max(self._rate_limited_until, loop.time() + delay)
+                continue
+
+            try:
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                raise Exception(f"Failed to fetch data from {url}: {e}")
+
+            return response.json()
+
+        raise Exception(f"Failed to fetch data from {url}: still rate limited after {MAX_ATTEMPTS} attempts")
+
+    async def _get_many(self, endpoint, ids, use_cache=True):
+        ids = list(dict.fromkeys(ids))
+
+        # Same cache tables as the blocking api, so both see each other's results
+        cache = api.get_cache()
+        entities = cache.get_many(endpoint, ids) if use_cache else {}
+        missing = [entity_id for entity_id in ids if entity_id not in entities]
+
+        responses = await asyncio.gather(*(self._fetch(api.ids_url(endpoint, chunk)) for chunk in api.chunk_ids(missing)))
+        fetched = {entity['id']: entity for response in responses for entity in response}
+
+        if fetched:
+            cache.put_many(endpoint, fetched)
+            entities.update(fetched)
+
+        return entities
+
+    async def get_professions(self, use_cache=True):
+        # Concurrent callers share one request for the professions list
+        async with self._professions_lock:
+            professions = api.get_cache().get_all('professions') if use_cache else {}
+
+            if not professions:
+                professions = api.prepare_professions(await self._fetch(api.professions_url()))
+                api.get_cache().put_many('professions', professions)
+
+        return professions
+
+    async def get_profession(self, profession_id, use_cache=True):
+        profession = api.get_cache().get('professions', profession_id) if use_cache else None
+
+        if profession is None:
+            profession = (await self.get_professions(use_cache=False))[profession_id]
+
+        return api.index_palette(profession)
+
+    async def get_skills(self, skill_ids, use_cache=True):
+        return await self._get_many('skills', skill_ids, use_cache)
+
+    async def get_specializations(self, specialization_ids, use_cache=True):
+        return await self._get_many('specializations', specialization_ids, use_cache)
+
+    async def get_traits(self, trait_ids, use_cache=True):
+        return await self._get_many('traits', trait_ids, use_cache)
+
+    async def _get_specializations_and_traits(self, specialization_ids):
+        specializations = await self.get_specializations(specialization_ids)
+
+        trait_ids = [trait_id for specialization in specializations.values()
+                     for trait_id in specialization['minor_traits'] + specialization['major_traits']]
+        await self.get_traits(trait_ids)
+
+    async def prefetch_build(self, build):
+        profession = await self.get_profession(build.profession_template)
+        skill_ids = api.palette_ids_to_skill_ids(profession, build.palette_ids())
+        specialization_ids = [specialization['id'] for specialization in build.specializations_template if specialization['id']]
+
+        await asyncio.gather(
+            self.get_skills(skill_ids),
+            self._get_specializations_and_traits(specialization_ids)
+        )
+
+    async def warm_cache(self):
+        professions = await self.get_professions()
+
+        skill_ids = [skill_id for profession in professions.values() for skill_id in profession['skills_by_palette'].values()]
+        specialization_ids = [specialization_id for profession in professions.values() for specialization_id in profession['specializations']]
+
+        await asyncio.gather(
+            self.get_skills(skill_ids),
+            self._get_specializations_and_traits(specialization_ids)
+        )
+
+
+async def _prefetch_build(build):
+    await AsyncClient().prefetch_build(build)
+
+
+async def _warm_cache():
+    await AsyncClient().warm_cache()
+
+
+# Blocking callers get a concurrent.futures.Future back and can carry on while the cache fills
+def prefetch_build(build):
+    return _executor.submit(asyncio.run, _prefetch_build(build))
+
+
+def warm_cache():
+    return _executor.submit(asyncio.run, _warm_cache())
+
+
+atexit.register(close)
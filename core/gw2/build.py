@@ -1,7 +1,7 @@
 import base64
 import re
 
-from .api import get_skill, get_profession
+from .api import get_skills, get_profession, palette_ids_to_skill_ids
 
 
 class Build(object):
@@ -68,16 +68,18 @@ class Build(object):
             raise ValueError("Invalid format")
 
     def load_skill_info(self):
-        profession_data = get_profession()
-        profession = profession_data[self.profession_template]
+        profession = get_profession(self.profession_template)
 
         if not profession:
             raise ValueError("Profession not found")
 
-        skill_palette = {pair[0]: pair[1] for pair in profession['skills_by_palette']}
+        skill_palette = profession['skills_by_palette']
 
-        def get_skill(skill_id):
-            return get_skill(skill_palette[skill_id]) if skill_id in skill_palette else None
+        # Resolve every slot in one batch instead of one request per skill
+        skills = get_skills(palette_ids_to_skill_ids(profession, self.palette_ids()))
+
+        def get_skill(palette_id):
+            return skills.get(skill_palette.get(palette_id))
 
         self.skills['terrestrial']['heal'] = get_skill(self.skills_template['terrestrial']['heal'])
         self.skills['aquatic']['heal'] = get_skill(self.skills_template['aquatic']['heal'])
@@ -94,6 +96,21 @@ class Build(object):
         self.specializations = self.specializations_template
         self.specific = self.specific_template
 
+    def palette_ids(self):
+        # Terrestrial then aquatic, heal, utilities and elite in slot order
+        palette_ids = []
+        for environment in ('terrestrial', 'aquatic'):
+            environment_template = self.skills_template[environment]
+            palette_ids.extend([environment_template['heal'], *environment_template['utilities'], environment_template['elite']])
+
+        return palette_ids
+
+    def prefetch(self):
+        # Fills the API cache for everything this build references on a background thread
+        from .async_api import prefetch_build
+
+        return prefetch_build(self)
+
     def to_string(self):
         retval = [0x0D, self.profession_template]
 
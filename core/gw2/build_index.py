@@ -0,0 +1,152 @@
+from .template import Template
+
+
+_SKILL_SLOTS = ('healing_skill', 'utility_skill_1', 'utility_skill_2', 'utility_skill_3', 'elite_skill')
+
+
+def _template_fields(template):
+    if isinstance(template, str):
+        template = Template(template)
+
+    specializations = [specialization['id'] for specialization in template.specializations]
+    traits = [choice for specialization in template.specializations for choice in specialization['traits']]
+    skills = [template.skills[environment][slot] for environment in ('terrestrial', 'aquatic') for slot in _SKILL_SLOTS]
+
+    return template.profession, specializations, traits, skills
+
+
+def _features(profession, specializations, traits, skills):
+    # Specializations and skills are unordered, a build with the same lines in another order is the same build.
+    # Palette ids are only unique within a profession, so skills are keyed by both. Empty slots are skipped.
+    features = [('profession', profession)]
+
+    for specialization_index, specialization_id in enumerate(specializations):
+        if not specialization_id:
+            continue
+
+        features.append(('specialization', specialization_id))
+        for tier, choice in enumerate(traits[specialization_index * 3:specialization_index * 3 + 3]):
+            if choice:
+                features.append(('trait', specialization_id, tier, choice))
+
+    features.extend(('skill', profession, palette_id) for palette_id in skills if palette_id)
+
+    return features
+
+
+class BuildIndex(object):
+    # Each build is packed into a bitset over every feature seen so far, with an inverted list per feature
+    def __init__(self):
+        self._bits = {}  # feature -> bit index
+        self._postings = {}  # bit index -> keys of builds having that feature
+        self._bitsets = {}  # key -> int bitset
+        self._professions = {}  # key -> profession
+
+    def __len__(self):
+        return len(self._bitsets)
+
+    def __contains__(self, key):
+        return key in self._bitsets
+
+    def _bitset(self, features, create=False):
+        bitset = 0
+        for feature in features:
+            bit = self._bits.get(feature)
+            if bit is None:
+                if not create:
+                    continue
+
+                bit = self._bits[feature] = len(self._bits)
+                self._postings[bit] = set()
+
+            bitset |= 1 << bit
+
+        return bitset
+
+    def _bit_indices(self, bitset):
+        while bitset:
+            lowest = bitset & -bitset
+            yield lowest.bit_length() - 1
+            bitset ^= lowest
+
+    def _add_fields(self, key, profession, specializations, traits, skills):
+        if key in self._bitsets:
+            self.remove(key)
+
+        bitset = self._bitset(_features(profession, specializations, traits, skills), create=True)
+        for bit in self._bit_indices(bitset):
+            self._postings[bit].add(key)
+
+        self._bitsets[key] = bitset
+        self._professions[key] = profession
+
+    def add(self, key, template):
+        self._add_fields(key, *_template_fields(template))
+
+    def add_columns(self, keys, columns):
+        # Bulk insert straight from decode_templates() without building a Template per code
+        for index, key in enumerate(keys):
+            self._add_fields(
+                key,
+                columns.profession[index],
+                columns.specializations[index * 3:index * 3 + 3],
+                columns.traits[index * 9:index * 9 + 9],
+                list(columns.terrestrial_skills[index * 5:index * 5 + 5]) + list(columns.aquatic_skills[index * 5:index * 5 + 5])
+            )
+
+    def remove(self, key):
+        bitset = self._bitsets.pop(key)
+        del self._professions[key]
+
+        for bit in self._bit_indices(bitset):
+            self._postings[bit].discard(key)
+
+    def similar(self, template, limit=5):
+        profession, specializations, traits, skills = _template_fields(template)
+        features = set(_features(profession, specializations, traits, skills))
+        query = self._bitset(features)
+        query_size = len(features)
+
+        # Only builds sharing at least one feature besides the profession can score above zero
+        profession_bit = self._bits.get(('profession', profession))
+        candidates = set()
+        for bit in self._bit_indices(query):
+            if bit != profession_bit:
+                candidates |= self._postings[bit]
+
+        scored = []
+        for key in candidates:
+            if self._professions[key] != profession:
+                continue
+
+            bitset = self._bitsets[key]
+            shared = (bitset & query).bit_count()
+
+            # Jaccard similarity, features the index has never seen still count towards the query size
+            union = bitset.bit_count() + query_size - shared
+            scored.append((shared / union, key))
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored[:limit]
+
+    def with_feature(self, feature):
+        bit = self._bits.get(feature)
+        return set(self._postings[bit]) if bit is not None else set()
+
+    def with_palette_id(self, palette_id, profession):
+        return self.with_feature(('skill', profession, palette_id))
+
+    def with_skill(self, skill_id):
+        # Skill ids have to be mapped to each profession's palette id, which needs the (cached) profession data
+        from .api import skill_id_to_palette_id
+
+        keys = set()
+        for profession in set(self._professions.values()):
+            palette_id = skill_id_to_palette_id(skill_id, profession)
+            if palette_id is not None:
+                keys |= self.with_palette_id(palette_id, profession)
+
+        return keys
+
+    def with_specialization(self, specialization_id):
+        return self.with_feature(('specialization', specialization_id))
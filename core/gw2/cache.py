@@ -0,0 +1,67 @@
+import pickle
+import sqlite3
+import threading
+
+
+class Cache(object):
+    TABLES = ('skills', 'professions', 'specializations', 'traits')
+
+    def __init__(self, file_path):
+        self._connection = sqlite3.connect(file_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+
+        for table in Cache.TABLES:
+            self._connection.execute(f"CREATE TABLE IF NOT EXISTS {table} (id PRIMARY KEY, data BLOB NOT NULL)")
+        self._connection.commit()
+
+        # Entities are unpickled on first access only and then kept in memory
+        self._loaded = {table: {} for table in Cache.TABLES}
+        self._lock = threading.Lock()
+
+    def get(self, table, key):
+        loaded = self._loaded[table]
+
+        try:
+            return loaded[key]
+        except KeyError:
+            pass
+
+        with self._lock:
+            row = self._connection.execute(f"SELECT data FROM {table} WHERE id = ?", (key,)).fetchone()
+
+        if row is None:
+            return None
+
+        value = loaded[key] = pickle.loads(row[0])
+        return value
+
+    def get_many(self, table, keys):
+        return {key: value for key in keys if (value := self.get(table, key)) is not None}
+
+    def get_all(self, table):
+        with self._lock:
+            rows = self._connection.execute(f"SELECT id, data FROM {table}").fetchall()
+
+        loaded = self._loaded[table]
+        for key, data in rows:
+            if key not in loaded:
+                loaded[key] = pickle.loads(data)
+
+        return dict(loaded)
+
+    def put(self, table, key, value):
+        self.put_many(table, {key: value})
+
+    def put_many(self, table, items):
+        rows = [(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)) for key, value in items.items()]
+
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(f"INSERT OR REPLACE INTO {table} (id, data) VALUES (?, ?)", rows)
+
+        self._loaded[table].update(items)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -1,116 +1,283 @@
 import base64
-import re
+import binascii
+import struct
+import sys
+from array import array
+from collections.abc import MutableMapping
+
+
+# Fixed part of a build template, everything after it is profession specific
+_FIXED_SIZE = 28
+_MIN_SIZE = 44
+_SKILLS_OFFSET = 8
+_SKILLS_SIZE = 20
+
+# Trait choices are packed two bits each into one byte per specialization
+_TRAIT_TABLES = [bytes((value >> (trait_index * 2)) & 0x03 for value in range(256)) for trait_index in range(3)]
+
+# Byte offset of each terrestrial skill slot, the aquatic slot follows two bytes later
+_SKILL_OFFSETS = {
+    'healing_skill': 8,
+    'utility_skill_1': 12,
+    'utility_skill_2': 16,
+    'utility_skill_3': 20,
+    'elite_skill': 24
+}
+
+_UINT16 = struct.Struct('<H')
+
+
+def _decode_chat_code(build_template):
+    if not build_template.startswith('[&') or not build_template.endswith(']'):
+        raise ValueError("Invalid Format")
+
+    # Validated, a lenient decode would silently drop stray characters and decode what is left
+    try:
+        bytes_ = base64.b64decode(build_template[2:-1], validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid Format")
+
+    if len(bytes_) > 0 and bytes_[0] != 0x0D:
+        raise ValueError("Unsupported Header")
+
+    if len(bytes_) < _MIN_SIZE:
+        raise ValueError("Invalid Build Template")
+
+    return bytes_
+
+
+class _Skills(MutableMapping):
+    # Skill slots of one environment, read from and written to the template bytes directly
+    def __init__(self, template, environment_offset):
+        self._template = template
+        self._environment_offset = environment_offset
+
+    def __getitem__(self, slot):
+        return _UINT16.unpack_from(self._template._data, _SKILL_OFFSETS[slot] + self._environment_offset)[0]
+
+    def __setitem__(self, slot, palette_id):
+        self._template._write(_SKILL_OFFSETS[slot] + self._environment_offset, _UINT16.pack(palette_id))
+
+    def __delitem__(self, slot):
+        raise TypeError("Skill slots cannot be removed")
+
+    def __iter__(self):
+        return iter(_SKILL_OFFSETS)
+
+    def __len__(self):
+        return len(_SKILL_OFFSETS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class _Traits(object):
+    def __init__(self, template, offset):
+        self._template = template
+        self._offset = offset
+
+    def __getitem__(self, trait_index):
+        return (self._template._data[self._offset] >> (range(3)[trait_index] * 2)) & 0x03
+
+    def __setitem__(self, trait_index, choice):
+        shift = range(3)[trait_index] * 2
+        value = self._template._data[self._offset] & ~(0x03 << shift) | (choice & 0x03) << shift
+        self._template._write(self._offset, bytes([value]))
+
+    def __len__(self):
+        return 3
+
+    def __iter__(self):
+        return (self[trait_index] for trait_index in range(3))
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class _Specialization(MutableMapping):
+    def __init__(self, template, specialization_index):
+        self._template = template
+        self._offset = 2 + specialization_index * 2
+        self._traits = _Traits(template, self._offset + 1)
+
+    def __getitem__(self, key):
+        if key == 'id':
+            return self._template._data[self._offset]
+        if key == 'traits':
+            return self._traits
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == 'id':
+            self._template._write(self._offset, bytes([value]))
+        elif key == 'traits':
+            self._template._write(self._offset + 1, bytes([value[2] << 4 | value[1] << 2 | value[0]]))
+        else:
+            raise KeyError(key)
+
+    def __delitem__(self, key):
+        raise TypeError("Specialization fields cannot be removed")
+
+    def __iter__(self):
+        return iter(('id', 'traits'))
+
+    def __len__(self):
+        return 2
+
+    def __repr__(self):
+        return repr(dict(self))
 
 
 class Template:
     def __init__(self, build_template=None):
-        self._build_template = None  # initialized in self._parse
+        self._data = bytearray(_MIN_SIZE)
+        self._data[0] = 0x0D
 
-        self.profession = 0
+        # Chat code of the current bytes, None once a field has changed until it is requested again
+        self._build_template = None
 
+        # Views over self._data, fields are decoded when read and written back in place
         self.skills = {
-            'terrestrial': {
-                'healing_skill': 0,
-                'utility_skill_1': 0,
-                'utility_skill_2': 0,
-                'utility_skill_3': 0,
-                'elite_skill': 0
-            },
-            'aquatic': {
-                'healing_skill': 0,
-                'utility_skill_1': 0,
-                'utility_skill_2': 0,
-                'utility_skill_3': 0,
-                'elite_skill': 0
-            },
+            'terrestrial': _Skills(self, 0),
+            'aquatic': _Skills(self, 2),
         }
-
-        self.specializations = [
-            {'id': 0, 'traits': [0, 0, 0]},
-            {'id': 0, 'traits': [0, 0, 0]},
-            {'id': 0, 'traits': [0, 0, 0]}
-        ]
-
-        self.specific = [0] * 16
+        self.specializations = [_Specialization(self, specialization_index) for specialization_index in range(3)]
 
         if build_template:
             self._parse(build_template)
 
     @property
     def build_template(self):
-        self._build_template = self.to_string()
+        if self._build_template is None:
+            self._build_template = "[&" + base64.b64encode(self._data).decode('utf-8') + "]"
+
         return self._build_template
 
     @build_template.setter
     def build_template(self, template):
         self._parse(template)
 
+    @property
+    def profession(self):
+        return self._data[1]
+
+    @profession.setter
+    def profession(self, profession):
+        self._write(1, bytes([profession]))
+
+    @property
+    def specific(self):
+        return bytes(self._data[_FIXED_SIZE:])
+
+    @specific.setter
+    def specific(self, specific):
+        self._data[_FIXED_SIZE:] = specific
+        self._build_template = None
+
+    def _write(self, offset, value):
+        end = offset + len(value)
+        if self._data[offset:end] != value:
+            self._data[offset:end] = value
+            self._build_template = None
+
     def _parse(self, build_template):
-        chat_code_regex = r"\[&([A-Za-z0-9+/=]+)\]"
-        match = re.match(chat_code_regex, build_template)
+        self._data = bytearray(_decode_chat_code(build_template))
+        self._build_template = build_template
 
-        if not match or len(match.groups()) != 1:
-            raise ValueError("Invalid Format")
+    def to_string(self):
+        return self.build_template
 
-        bytes_ = list(base64.b64decode(match.group(1)))
 
-        if len(bytes_) > 0 and bytes_[0] != 0x0D:
-            raise ValueError("Unsupported Header")
+class TemplateColumns(object):
+    # Skill columns hold five palette ids per template in the order heal, utility 1-3, elite
+    def __init__(self):
+        self.profession = array('B')
+        self.specializations = array('B')  # 3 per template
+        self.traits = array('B')  # 9 per template, 3 per specialization
+        self.terrestrial_skills = array('H')  # 5 per template
+        self.aquatic_skills = array('H')  # 5 per template
+        self.specific = []  # remaining bytes of each template
 
-        if len(bytes_) < 44:
-            raise ValueError("Invalid Build Template")
+    def __len__(self):
+        return len(self.profession)
 
-        self.profession = bytes_[1]
 
-        for specialization_index in range(3):
-            offset = specialization_index * 2
-            traits = [(bytes_[offset + 3] >> (trait_index * 2)) & 0x03 for trait_index in range(3)]
+def decode_templates(build_templates):
+    fixed = bytearray()
+    columns = TemplateColumns()
 
-            self.specializations[specialization_index]['id'] = bytes_[offset + 2]
-            self.specializations[specialization_index]['traits'] = traits
+    for build_template in build_templates:
+        bytes_ = _decode_chat_code(build_template)
+        fixed += bytes_[:_FIXED_SIZE]
+        columns.specific.append(bytes_[_FIXED_SIZE:])
 
-        self.skills['terrestrial']['healing_skill'] = bytes_[8] + (bytes_[9] << 8)
-        self.skills['aquatic']['healing_skill'] = bytes_[10] + (bytes_[11] << 8)
+    count = len(columns.specific)
 
-        for utility_index in range(3):
-            offset = utility_index * 4 + 12
-            self.skills['terrestrial']['utilities'][utility_index] = bytes_[offset] + (bytes_[offset + 1] << 8)
-            self.skills['aquatic']['utilities'][utility_index] = bytes_[offset + 2] + (bytes_[offset + 3] << 8)
+    # Every column is cut out of the concatenated fixed parts with strided slices, no per template loop
+    columns.profession = array('B', fixed[1::_FIXED_SIZE])
 
-        self.skills['terrestrial']['elite'] = bytes_[24] + (bytes_[25] << 8)
-        self.skills['aquatic']['elite'] = bytes_[26] + (bytes_[27] << 8)
+    specializations = bytearray(count * 3)
+    traits = bytearray(count * 9)
+    for specialization_index in range(3):
+        offset = 2 + specialization_index * 2
+        specializations[specialization_index::3] = fixed[offset::_FIXED_SIZE]
 
-        self.specific = bytes_[28:]
+        trait_bytes = bytes(fixed[offset + 1::_FIXED_SIZE])
+        for trait_index in range(3):
+            traits[specialization_index * 3 + trait_index::9] = trait_bytes.translate(_TRAIT_TABLES[trait_index])
 
-        self._build_template = build_template
+    columns.specializations = array('B', specializations)
+    columns.traits = array('B', traits)
+
+    skill_bytes = bytearray(count * _SKILLS_SIZE)
+    for byte_index in range(_SKILLS_SIZE):
+        skill_bytes[byte_index::_SKILLS_SIZE] = fixed[_SKILLS_OFFSET + byte_index::_FIXED_SIZE]
+
+    skills = array('H')
+    skills.frombytes(skill_bytes)
+    if sys.byteorder == 'big':
+        skills.byteswap()
+
+    # Terrestrial and aquatic ids alternate within each template
+    columns.terrestrial_skills = skills[0::2]
+    columns.aquatic_skills = skills[1::2]
+
+    return columns
 
-    def to_string(self):
-        retval = [0x0D, self.profession]
 
-        for specialization_index in range(3):
-            retval.append(self.specializations[specialization_index]['id'])
-            retval.append(self.specializations[specialization_index]['traits'][2] << 4 |
-                          self.specializations[specialization_index]['traits'][1] << 2 |
-                          self.specializations[specialization_index]['traits'][0])
+def encode_templates(columns):
+    count = len(columns)
+    fixed = bytearray(count * _FIXED_SIZE)
 
-        retval.extend([self.skills['terrestrial']['healing_skill'] & 0xFF,
-                       self.skills['terrestrial']['healing_skill'] >> 8 & 0xFF])
+    fixed[0::_FIXED_SIZE] = b'\x0D' * count
+    fixed[1::_FIXED_SIZE] = columns.profession.tobytes()
 
-        retval.extend([self.skills['aquatic']['healing_skill'] & 0xFF,
-                       self.skills['aquatic']['healing_skill'] >> 8 & 0xFF])
+    for specialization_index in range(3):
+        offset = 2 + specialization_index * 2
+        fixed[offset::_FIXED_SIZE] = columns.specializations[specialization_index::3].tobytes()
 
-        for utility_index in range(3):
-            retval.extend([self.skills['terrestrial'][f'utility_skill_{utility_index}'] & 0xFF,
-                           self.skills['terrestrial'][f'utility_skill_{utility_index}'] >> 8 & 0xFF])
-            retval.extend([self.skills['aquatic'][f'utility_skill_{utility_index}'] & 0xFF,
-                           self.skills['aquatic'][f'utility_skill_{utility_index}'] >> 8 & 0xFF])
+        # Choices never exceed two bits, so shifting the whole column as one integer keeps every byte separate
+        packed = 0
+        for trait_index in range(3):
+            trait_bytes = columns.traits[specialization_index * 3 + trait_index::9].tobytes()
+            packed |= int.from_bytes(trait_bytes, 'little') << (trait_index * 2)
 
-        retval.extend([self.skills['terrestrial']['elite_skill'] & 0xFF,
-                       self.skills['terrestrial']['elite_skill'] >> 8 & 0xFF])
+        fixed[offset + 1::_FIXED_SIZE] = packed.to_bytes(count, 'little')
 
-        retval.extend([self.skills['aquatic']['elite_skill'] & 0xFF,
-                       self.skills['aquatic']['elite_skill'] >> 8 & 0xFF])
+    skills = array('H', bytes(count * _SKILLS_SIZE))
+    skills[0::2] = columns.terrestrial_skills
+    skills[1::2] = columns.aquatic_skills
+    if sys.byteorder == 'big':
+        skills.byteswap()
 
-        retval.extend(self.specific)
+    skill_bytes = skills.tobytes()
+    for byte_index in range(_SKILLS_SIZE):
+        fixed[_SKILLS_OFFSET + byte_index::_FIXED_SIZE] = skill_bytes[byte_index::_SKILLS_SIZE]
 
-        return "[&" + base64.b64encode(bytes(retval)).decode('utf-8') + "]"
+    return [
+        "[&" + base64.b64encode(fixed[index * _FIXED_SIZE:(index + 1) * _FIXED_SIZE] + specific).decode('utf-8') + "]"
+        for index, specific in enumerate(columns.specific)
+    ]
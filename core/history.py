@@ -0,0 +1,103 @@
+import sys
+from collections import deque
+
+
+# Upper bound on the estimated memory held by undo and redo steps, the oldest steps are dropped past it
+HISTORY_MAX_BYTES = 16 * 1024 * 1024
+
+
+def _sequence_size(snapshot):
+    # Containers only, names and actions are shared strings that the snapshots don't own
+    _, _, actions, transitions = snapshot
+    return (sys.getsizeof(snapshot) + sys.getsizeof(actions) + sys.getsizeof(transitions)
+            + sum(sys.getsizeof(transition) for transition in transitions))
+
+
+def _step_size(snapshot, neighbour):
+    # What keeping a snapshot around costs on top of the one next to it, sequences both share are free
+    shared = {id(sequence) for sequence in neighbour}
+    return sys.getsizeof(snapshot) + sum(_sequence_size(sequence) for sequence in snapshot if id(sequence) not in shared)
+
+
+class History(object):
+    # Undo and redo over Rotation.snapshot(). Snapshots share every sequence that didn't change between them, so
+    # a step only costs the sequences touched by that edit.
+    def __init__(self, max_bytes=HISTORY_MAX_BYTES):
+        self.max_bytes = max_bytes
+
+        self._current: tuple = ()
+        self._undo = deque()  # (snapshot, estimated bytes), oldest first
+        self._redo = []
+        self._bytes = 0
+
+    def reset(self, rotation):
+        self._current = rotation.snapshot()
+        self._undo.clear()
+        self._redo.clear()
+        self._bytes = 0
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    @property
+    def size(self) -> int:
+        return self._bytes
+
+    def record(self, rotation) -> bool:
+        snapshot = rotation.snapshot()
+        if len(snapshot) == len(self._current) and all(a is b for a, b in zip(snapshot, self._current)):
+            return False
+
+        self._push(self._undo, self._current, snapshot)
+
+        for _, size in self._redo:
+            self._bytes -= size
+        self._redo.clear()
+
+        self._current = snapshot
+        self._trim()
+        return True
+
+    def undo(self, rotation) -> bool:
+        if not self._undo:
+            return False
+
+        snapshot, size = self._undo.pop()
+        self._bytes -= size
+        self._push(self._redo, self._current, snapshot)
+
+        self._current = snapshot
+        rotation.restore(snapshot)
+        self._trim()
+        return True
+
+    def redo(self, rotation) -> bool:
+        if not self._redo:
+            return False
+
+        snapshot, size = self._redo.pop()
+        self._bytes -= size
+        self._push(self._undo, self._current, snapshot)
+
+        self._current = snapshot
+        rotation.restore(snapshot)
+        self._trim()
+        return True
+
+    def _push(self, stack, snapshot, neighbour):
+        size = _step_size(snapshot, neighbour)
+        stack.append((snapshot, size))
+        self._bytes += size
+
+    def _trim(self):
+        # Oldest undo steps go first, redo steps only once there is no undo left to drop
+        while self._bytes > self.max_bytes and self._undo:
+            self._bytes -= self._undo.popleft()[1]
+
+        while self._bytes > self.max_bytes and self._redo:
+            self._bytes -= self._redo.pop(0)[1]
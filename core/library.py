@@ -0,0 +1,149 @@
+import json
+import os
+
+from .state import PACKED_MAGIC
+from .utils import atomic_write
+
+
+INDEX_FILE = 'index.json'
+ROTATION_EXTENSIONS = ('.json', '.gw2r')
+
+
+def _summarize_rotation(file_path):
+    with open(file_path, 'rb') as file:
+        packed = file.read(len(PACKED_MAGIC)) == PACKED_MAGIC
+
+    if packed:
+        from .rotation_pack import PackedRotation
+
+        # Names and counts come straight from the packed tables, no sequence is built
+        with PackedRotation(file_path) as packed_rotation:
+            return [
+                {'name': packed_rotation.sequence_name(sequence_index), 'actions': packed_rotation.action_count(sequence_index)}
+                for sequence_index in range(packed_rotation.sequence_count)
+            ]
+
+    with open(file_path, 'r') as file:
+        data = json.load(file)
+
+    return [{'name': sequence['name'], 'actions': len(sequence['actions'])} for sequence in data]
+
+
+class RotationLibrary(object):
+    # A directory of rotation files with an index that is only updated for files whose mtime or size changed.
+    # Templates and professions are assigned to a file through the library and kept in the index.
+    def __init__(self, directory):
+        self.directory = directory
+        self._index_path = os.path.join(directory, INDEX_FILE)
+        self._entries = {}
+        self._build_index = None
+
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self._index_path, 'r') as file:
+                self._entries = {entry['file']: entry for entry in json.load(file)}
+        except (FileNotFoundError, ValueError):
+            # Missing or unreadable index, rebuilt on the next refresh
+            self._entries = {}
+
+    def _save_index(self):
+        entries = sorted(self._entries.values(), key=lambda entry: entry['file'])
+        atomic_write(self._index_path, json.dumps(entries, indent=4))
+
+    def refresh(self):
+        changed = False
+        seen = set()
+
+        with os.scandir(self.directory) as directory_entries:
+            for directory_entry in directory_entries:
+                name = directory_entry.name
+                if name == INDEX_FILE or not name.lower().endswith(ROTATION_EXTENSIONS) or not directory_entry.is_file():
+                    continue
+
+                seen.add(name)
+                stat = directory_entry.stat()
+                entry = self._entries.get(name)
+
+                if entry and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                    continue
+
+                # Unreadable files are indexed too, with the error, so they are only retried once they change
+                error = None
+                try:
+                    sequences = _summarize_rotation(directory_entry.path)
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    print(f"Skipping {name}: {e}")
+                    sequences = []
+                    error = str(e)
+
+                self._entries[name] = {
+                    'file': name,
+                    'mtime': stat.st_mtime_ns,
+                    'size': stat.st_size,
+                    'sequences': sequences,
+                    'error': error,
+                    'template': entry.get('template') if entry else None,
+                    'profession': entry.get('profession') if entry else None
+                }
+                changed = True
+
+        for name in set(self._entries) - seen:
+            del self._entries[name]
+            changed = True
+
+        if changed:
+            self._build_index = None
+            self._save_index()
+
+        return changed
+
+    def path(self, entry):
+        return os.path.join(self.directory, entry['file'])
+
+    def entries(self):
+        # Files that failed to parse stay in the index but aren't offered
+        return sorted((entry for entry in self._entries.values() if not entry.get('error')), key=lambda entry: entry['file'].lower())
+
+    def search(self, text):
+        text = text.lower()
+        return [
+            entry for entry in self.entries()
+            if text in entry['file'].lower() or any(text in sequence['name'].lower() for sequence in entry['sequences'])
+        ]
+
+    def set_template(self, file_name, build_template):
+        from .gw2.template import Template
+
+        entry = self._entries[file_name]
+        entry['template'] = build_template
+        entry['profession'] = Template(build_template).profession if build_template else None
+
+        self._build_index = None
+        self._save_index()
+
+    def set_profession(self, file_name, profession):
+        self._entries[file_name]['profession'] = profession
+        self._save_index()
+
+    def for_profession(self, profession):
+        return [entry for entry in self.entries() if entry['profession'] == profession]
+
+    def for_template(self, build_template):
+        from .gw2.build_index import BuildIndex
+        from .gw2.template import Template
+
+        template = Template(build_template)
+
+        if self._build_index is None:
+            self._build_index = BuildIndex()
+            for entry in self._entries.values():
+                if entry['template'] and not entry.get('error'):
+                    self._build_index.add(entry['file'], entry['template'])
+
+        # Closest builds first, then rotations that only have the profession set
+        ranked = [self._entries[file_name] for _, file_name in self._build_index.similar(template, limit=len(self._entries))]
+        ranked_files = {entry['file'] for entry in ranked}
+
+        return ranked + [entry for entry in self.for_profession(template.profession) if entry['file'] not in ranked_files]
@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+LATENCY_STAGES = ('hook', 'signal', 'rotation', 'paint', 'total')
+
+
+def percentile(sorted_samples, fraction):
+    if not sorted_samples:
+        return 0
+
+    index = min(len(sorted_samples) - 1, int(round(fraction * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+# Follows a single input from the keyboard hook to the overlay repaint. begin() runs on the hook thread,
+# everything else on the GUI thread. Each stage records the time since the previous stage.
+class LatencyTracker(object):
+    def __init__(self, window=2048, enabled=False):
+        self.enabled = enabled
+        self._samples = {stage: deque(maxlen=window) for stage in LATENCY_STAGES}
+
+        # (start, last mark) of the input currently in flight, replaced as a whole so the hook thread
+        # never leaves it half written
+        self._pending = None
+
+    def begin(self):
+        if not self.enabled:
+            return
+
+        now = time.perf_counter_ns()
+        self._pending = (now, now)
+
+    def mark(self, stage):
+        pending = self._pending
+        if pending is None:
+            return
+
+        now = time.perf_counter_ns()
+        self._samples[stage].append(now - pending[1])
+        self._pending = (pending[0], now)
+
+    def end(self, stage):
+        pending = self._pending
+        if pending is None:
+            return
+
+        now = time.perf_counter_ns()
+        self._samples[stage].append(now - pending[1])
+        self._samples['total'].append(now - pending[0])
+        self._pending = None
+
+    def cancel(self):
+        self._pending = None
+
+    def percentiles(self, stage, fractions=(0.5, 0.95, 0.99)):
+        samples = sorted(self._samples[stage])
+        return [percentile(samples, fraction) for fraction in fractions]
+
+    def report(self):
+        lines = [f"{'stage':<10}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+        for stage in LATENCY_STAGES:
+            p50, p95, p99 = self.percentiles(stage)
+            lines.append(f"{stage:<10}{len(self._samples[stage]):>8}"
+                         f"{p50 / 1e6:>10.3f}{p95 / 1e6:>10.3f}{p99 / 1e6:>10.3f}")
+
+        return "\n".join(lines)
+
+
+latency = LatencyTracker()
+
+
+# Wall time of each startup phase, enabled with --trace-startup or GW2RH_TRACE_STARTUP=1. Phases are timed
+# back to back from process start so the gaps between them show up as well.
+class StartupTrace(object):
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._start = time.perf_counter_ns()
+        self._phases = []
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self._phases.append((name, start - self._start, time.perf_counter_ns() - start))
+
+    def report(self):
+        lines = [f"{'phase':<24}{'start ms':>10}{'took ms':>10}"]
+        for name, offset, duration in self._phases:
+            lines.append(f"{name:<24}{offset / 1e6:>10.1f}{duration / 1e6:>10.1f}")
+
+        lines.append(f"{'ready':<24}{(time.perf_counter_ns() - self._start) / 1e6:>10.1f}")
+        return "\n".join(lines)
+
+
+startup = StartupTrace(enabled='--trace-startup' in sys.argv or os.environ.get('GW2RH_TRACE_STARTUP') == '1')
@@ -0,0 +1,102 @@
+import argparse
+import sys
+import time
+from collections import Counter
+
+from .profiling import percentile
+from .state import Rotation
+
+
+def load_inputs(file_path):
+    # One control name per line, blank lines and lines starting with '#' are ignored
+    with open(file_path, 'r') as file:
+        return [line.strip() for line in file if line.strip() and not line.lstrip().startswith('#')]
+
+
+class ReplayResult(object):
+    def __init__(self):
+        self.events = 0
+        self.state_changes = 0
+        self.transitions = Counter()
+        self.timings = []
+
+        self.sequence = None
+        self.position = None
+        self.action = None
+
+    def report(self):
+        timings = sorted(self.timings)
+        total = sum(timings)
+
+        lines = [
+            f"events:        {self.events}",
+            f"state changes: {self.state_changes}",
+            f"final state:   {self.sequence} @ {self.position} ({self.action})",
+            "",
+            "timings (us):  "
+            f"mean {total / len(timings) / 1e3 if timings else 0:.3f}  "
+            f"p50 {percentile(timings, 0.5) / 1e3:.3f}  "
+            f"p95 {percentile(timings, 0.95) / 1e3:.3f}  "
+            f"p99 {percentile(timings, 0.99) / 1e3:.3f}  "
+            f"max {(timings[-1] if timings else 0) / 1e3:.3f}",
+            "",
+            "transitions:",
+        ]
+
+        for (source, target), count in self.transitions.most_common():
+            lines.append(f"  {source} -> {target}: {count}")
+
+        return "\n".join(lines)
+
+
+def replay(rotation, controls):
+    result = ReplayResult()
+    clock = time.perf_counter_ns
+
+    for control in controls:
+        source = rotation.current_sequence
+        source_position = source.position if source else None
+
+        start = clock()
+        state_changed = rotation.on_control_pressed(control)
+        result.timings.append(clock() - start)
+
+        result.events += 1
+        if not state_changed:
+            continue
+
+        result.state_changes += 1
+
+        # Anything other than advancing one step in the same sequence went through a transition
+        target = rotation.current_sequence
+        if target is not source or target.position != source_position + 1:
+            result.transitions[(source.name, target.name)] += 1
+
+    current_sequence = rotation.current_sequence
+    if current_sequence:
+        result.sequence = current_sequence.name
+        result.position = current_sequence.position
+        result.action = current_sequence.action
+
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m core.replay',
+                                     description="Replay recorded controls through a rotation without Qt or a GW2 client.")
+    parser.add_argument('rotation', help="rotation file to load")
+    parser.add_argument('inputs', help="file with one control name per line")
+    parser.add_argument('--repeat', type=int, default=1, help="replay the inputs this many times")
+    args = parser.parse_args(argv)
+
+    rotation = Rotation.load_from_file(args.rotation)
+    controls = load_inputs(args.inputs) * args.repeat
+
+    result = replay(rotation, controls)
+    print(result.report())
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
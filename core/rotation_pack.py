@@ -0,0 +1,230 @@
+import argparse
+import mmap
+import struct
+import sys
+from array import array
+
+from .state import Rotation, Sequence, Transition, PACKED_MAGIC
+from .utils import atomic_write
+
+
+# Layout, all integers little endian:
+#   header       magic, version, reserved, string count, sequence count, action count, transition count
+#   strings      string count + 1 offsets into the string data
+#   sequences    name, first action, action count, first transition, transition count
+#   actions      string id per action
+#   transitions  to (string id of the sequence name), on (string id), to position
+#   string data  utf-8
+PACKED_VERSION = 1
+
+_HEADER = struct.Struct('<4sHHIIII')
+_SEQUENCE_FIELDS = 5
+_TRANSITION_FIELDS = 3
+
+
+def _uint32_array(values):
+    table = array('I', values)
+    if sys.byteorder == 'big':
+        table.byteswap()
+
+    return table.tobytes()
+
+
+def pack(rotation):
+    string_ids = {}
+    strings = []
+
+    def intern(string):
+        try:
+            return string_ids[string]
+        except KeyError:
+            string_ids[string] = len(strings)
+            strings.append(string)
+            return string_ids[string]
+
+    sequence_table = []
+    action_table = []
+    transition_table = []
+
+    for sequence in rotation._sequences:
+        sequence_table.extend([
+            intern(sequence.name),
+            len(action_table),
+            len(sequence.actions),
+            len(transition_table) // _TRANSITION_FIELDS,
+            len(sequence.transitions)
+        ])
+
+        action_table.extend(intern(action) for action in sequence.actions)
+        for transition in sequence.transitions:
+            transition_table.extend([intern(rotation.sequence_name(transition.to)), intern(transition.on), transition.to_position])
+
+    encoded_strings = [string.encode('utf-8') for string in strings]
+    string_offsets = [0]
+    for encoded in encoded_strings:
+        string_offsets.append(string_offsets[-1] + len(encoded))
+
+    return b''.join([
+        _HEADER.pack(PACKED_MAGIC, PACKED_VERSION, 0, len(strings), len(rotation._sequences),
+                     len(action_table), len(transition_table) // _TRANSITION_FIELDS),
+        _uint32_array(string_offsets),
+        _uint32_array(sequence_table),
+        _uint32_array(action_table),
+        _uint32_array(transition_table),
+        *encoded_strings
+    ])
+
+
+def save_packed(rotation, file_path):
+    atomic_write(file_path, pack(rotation))
+
+
+class PackedRotation(object):
+    # Reads a packed rotation straight from the mapped file, strings and sequences are only decoded when asked for
+    def __init__(self, file_path):
+        with open(file_path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self._read_tables()
+        except BaseException:
+            self._mmap.close()
+            raise
+
+    def _read_tables(self):
+        # Every count and offset is checked against the file size, a truncated or corrupt file is a ValueError
+        # rather than a struct or index error somewhere later
+        if len(self._mmap) < _HEADER.size:
+            raise ValueError("Truncated packed rotation header")
+
+        magic, version, _, string_count, sequence_count, action_count, transition_count = _HEADER.unpack_from(self._mmap)
+        if magic != PACKED_MAGIC:
+            raise ValueError("Not a packed rotation")
+
+        if version != PACKED_VERSION:
+            raise ValueError(f"Unsupported packed rotation version {version}")
+
+        table_counts = [string_count + 1, sequence_count * _SEQUENCE_FIELDS, action_count, transition_count * _TRANSITION_FIELDS]
+        offset = _HEADER.size
+        table_offsets = []
+        for count in table_counts:
+            table_offsets.append(offset)
+            offset += count * 4
+
+        if offset > len(self._mmap):
+            raise ValueError("Packed rotation tables extend past the end of the file")
+
+        tables = [self._uint32_table(table_offset, count) for table_offset, count in zip(table_offsets, table_counts)]
+        self._string_offsets, self._sequence_table, self._action_table, self._transition_table = tables
+        self._string_data_offset = offset
+        self._strings = {}
+
+        self.sequence_count = sequence_count
+
+        try:
+            self._validate(string_count, action_count, transition_count)
+        except ValueError:
+            self._release_tables()
+            raise
+
+    def _validate(self, string_count, action_count, transition_count):
+        string_offsets = self._string_offsets
+        if any(string_offsets[index] > string_offsets[index + 1] for index in range(string_count)) or \
+                self._string_data_offset + string_offsets[string_count] > len(self._mmap):
+            raise ValueError("Packed rotation strings extend past the end of the file")
+
+        for sequence_index in range(self.sequence_count):
+            name, first_action, sequence_action_count, first_transition, sequence_transition_count = \
+                self._sequence_table[sequence_index * _SEQUENCE_FIELDS:(sequence_index + 1) * _SEQUENCE_FIELDS]
+
+            if name >= string_count or first_action + sequence_action_count > action_count or \
+                    first_transition + sequence_transition_count > transition_count:
+                raise ValueError(f"Packed rotation sequence {sequence_index} points past its tables")
+
+        if any(string_id >= string_count for string_id in self._action_table):
+            raise ValueError("Packed rotation action points past the string table")
+
+        for transition_index in range(transition_count):
+            to, on, _ = self._transition_table[transition_index * _TRANSITION_FIELDS:(transition_index + 1) * _TRANSITION_FIELDS]
+            if to >= string_count or on >= string_count:
+                raise ValueError("Packed rotation transition points past the string table")
+
+    def _uint32_table(self, offset, count):
+        # Zero copy on little endian machines, the only place the mapping is not used directly is big endian
+        if sys.byteorder == 'little':
+            return memoryview(self._mmap)[offset:offset + count * 4].cast('I')
+
+        table = array('I', self._mmap[offset:offset + count * 4])
+        table.byteswap()
+        return table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _release_tables(self):
+        for table in (self._string_offsets, self._sequence_table, self._action_table, self._transition_table):
+            if isinstance(table, memoryview):
+                table.release()
+
+    def close(self):
+        self._release_tables()
+        self._mmap.close()
+
+    def string(self, string_id):
+        try:
+            return self._strings[string_id]
+        except KeyError:
+            start = self._string_data_offset + self._string_offsets[string_id]
+            end = self._string_data_offset + self._string_offsets[string_id + 1]
+            string = self._strings[string_id] = self._mmap[start:end].decode('utf-8')
+            return string
+
+    def sequence_name(self, sequence_index):
+        return self.string(self._sequence_table[sequence_index * _SEQUENCE_FIELDS])
+
+    def sequence_names(self):
+        return [self.sequence_name(sequence_index) for sequence_index in range(self.sequence_count)]
+
+    def action_count(self, sequence_index):
+        return self._sequence_table[sequence_index * _SEQUENCE_FIELDS + 2]
+
+    def sequence(self, sequence_index):
+        name, first_action, action_count, first_transition, transition_count = \
+            self._sequence_table[sequence_index * _SEQUENCE_FIELDS:(sequence_index + 1) * _SEQUENCE_FIELDS]
+
+        actions = [self.string(string_id) for string_id in self._action_table[first_action:first_action + action_count]]
+
+        transitions = []
+        for transition_index in range(first_transition, first_transition + transition_count):
+            to, on, to_position = self._transition_table[transition_index * _TRANSITION_FIELDS:(transition_index + 1) * _TRANSITION_FIELDS]
+            transitions.append(Transition(self.string(to), self.string(on), to_position))
+
+        return Sequence(self.string(name), actions, transitions)
+
+    def to_rotation(self):
+        rotation = Rotation()
+        for sequence_index in range(self.sequence_count):
+            rotation.add_sequence(self.sequence(sequence_index))
+
+        rotation._bind_transitions()
+        rotation.compile()
+        return rotation
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m core.rotation_pack',
+                                     description="Pack a JSON rotation into the compiled binary format.")
+    parser.add_argument('rotation', help="JSON rotation file")
+    parser.add_argument('output', help="packed rotation file to write")
+    args = parser.parse_args(argv)
+
+    save_packed(Rotation.load_from_file(args.rotation), args.output)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
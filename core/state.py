@@ -1,20 +1,100 @@
 import json
 
+from .utils import atomic_write
+
+
+# First bytes of a rotation written by core.rotation_pack, anything else is read as JSON
+PACKED_MAGIC = b'GW2R'
+PACKED_EXTENSION = '.gw2r'
+
 
 class Sequence(object):
     def __init__(self, name, actions, transitions=None):
-        self.name: str = name
-        self.actions: list[str] = actions
+        self._name: str = name
+        self._actions: list[str] = actions
         self.position = 0
 
+        # Assigned by the rotation the sequence is added to and kept through renames, transitions refer to it
+        self.id: int = None
+        self._rotation: Rotation = None
+
         self.transitions = transitions or []
+        for transition in self.transitions:
+            transition._sequence = self
+
         self.validate_transitions()
 
+        # Set by every edit, position changes are runtime state and don't count
+        self._dirty = False
+        self._snapshot: tuple = None
+
+    def _changed(self):
+        self._dirty = True
+        self._snapshot = None
+        self._invalidate_compiled()
+
+    def _invalidate_compiled(self):
+        # The owning rotation's compiled tables are rebuilt on the next input
+        if self._rotation is not None:
+            self._rotation._compiled = None
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @name.setter
+    def name(self, name: str):
+        if name != self._name:
+            old_name = self._name
+            self._name = name
+            self._changed()
+
+            if self._rotation is not None:
+                self._rotation._reindex_name(old_name)
+                self._rotation._reindex_name(name)
+
+    # Edit through append_action/set_action or assign a new list, changes made to the list directly are not tracked
+    @property
+    def actions(self) -> list[str]:
+        return self._actions
+
+    @actions.setter
+    def actions(self, actions: list[str]):
+        self._actions = actions
+        self._changed()
+
+    def append_action(self, action: str):
+        self._actions.append(action)
+        self._changed()
+
+    def extend_actions(self, actions: list[str]):
+        self._actions.extend(actions)
+        self._changed()
+
+    def set_action(self, index: int, action: str):
+        if self._actions[index] != action:
+            self._actions[index] = action
+            self._changed()
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty or any(transition.dirty for transition in self.transitions)
+
+    def mark_clean(self):
+        self._dirty = False
+        for transition in self.transitions:
+            transition.mark_clean()
+
     def on_enter(self, position=0):
         self.position = position
 
     def add_transition(self, transition):
+        if self._rotation is not None:
+            self._rotation._bind(transition)
+
+        transition._sequence = self
         self.transitions.append(transition)
+        self._changed()
         self.validate_transitions()
 
     def validate_transitions(self):
@@ -23,15 +103,42 @@ class Sequence(object):
     @property
     def action(self):
         try:
-            return self.actions[self.position]
+            return self._actions[self.position]
         except IndexError:
             return None
 
-    def to_dict(self):
+    def snapshot(self) -> tuple:
+        # Immutable (id, name, actions, transitions) view, only rebuilt after an edit. Unchanged sequences hand out
+        # the same tuple, so snapshots of a rotation share everything but the sequences that changed.
+        transitions = tuple(transition.snapshot() for transition in self.transitions)
+
+        snapshot = self._snapshot
+        if snapshot is None or len(transitions) != len(snapshot[3]) or \
+                any(transition is not cached for transition, cached in zip(transitions, snapshot[3])):
+            self._snapshot = (self.id, self._name, tuple(self._actions), transitions)
+
+        return self._snapshot
+
+    @staticmethod
+    def from_snapshot(snapshot):
+        sequence_id, name, actions, transitions = snapshot
+
+        sequence = Sequence(name, list(actions), [Transition.from_snapshot(transition) for transition in transitions])
+        sequence.id = sequence_id
+        sequence._snapshot = snapshot
+        return sequence
+
+    def copy(self):
+        # Keeps the id so copied transitions still point at the matching copied sequences
+        sequence = Sequence(self.name, list(self.actions), [transition.copy() for transition in self.transitions])
+        sequence.id = self.id
+        return sequence
+
+    def to_dict(self, sequence_names=None):
         return {
             'name': self.name,
             'actions': self.actions,
-            'transitions': [transition.to_dict() for transition in self.transitions]
+            'transitions': [transition.to_dict(sequence_names) for transition in self.transitions]
         }
 
     @staticmethod
@@ -42,55 +149,287 @@ class Sequence(object):
         return Sequence(name, actions, transitions)
 
 
+class CompiledRotation(object):
+    COMPLETE = 0
+
+    def __init__(self, sequences: list[Sequence]):
+        # Events and actions share one table so a control only has to be interned once per keypress
+        self.event_ids: dict[str, int] = {'complete': CompiledRotation.COMPLETE}
+        self.event_names: list[str] = ['complete']
+
+        # Both map to the sequence's index in the list, transitions bound to a sequence use its id and
+        # unbound ones still hold the name
+        self.sequence_indices_by_name: dict[str, int] = {}
+        self.sequence_indices_by_id: dict[int, int] = {}
+        for sequence_index, sequence in enumerate(sequences):
+            self.sequence_indices_by_name.setdefault(sequence.name, sequence_index)
+            self.sequence_indices_by_id[sequence.id] = sequence_index
+
+        self.actions: list[tuple[int, ...]] = [
+            tuple(self._intern(action) for action in sequence.actions) for sequence in sequences
+        ]
+
+        self.transitions: list[dict[int, tuple[int, int]]] = []
+        for sequence in sequences:
+            table = {}
+            for transition in sequence.transitions:
+                if isinstance(transition.to, int):
+                    target_index = self.sequence_indices_by_id.get(transition.to)
+                else:
+                    target_index = self.sequence_indices_by_name.get(transition.to)
+
+                if target_index is None:
+                    continue
+
+                # First matching transition wins, same as the order they are declared in
+                table.setdefault(self._intern(transition.on), (target_index, transition.to_position))
+
+            self.transitions.append(table)
+
+    def _intern(self, name: str) -> int:
+        try:
+            return self.event_ids[name]
+        except KeyError:
+            event_id = len(self.event_names)
+            self.event_ids[name] = event_id
+            self.event_names.append(name)
+            return event_id
+
+
 class Rotation(object):
     def __init__(self):
         self._sequences: list[Sequence] = []
-        self.current_sequence: Sequence = None
+        self._current_index: int = None
+        self._compiled: CompiledRotation = None
+
+        self._sequences_by_id: dict[int, Sequence] = {}
+        self._ids_by_name: dict[str, int] = {}  # first sequence with the name, in rotation order
+        self._next_sequence_id = 0
+
+        self._dirty = False
+        self._saved_path: str = None
+
+    @property
+    def current_sequence(self) -> Sequence:
+        if self._current_index is None:
+            return None
 
-        self._character
+        return self._sequences[self._current_index]
 
     def add_sequence(self, sequence: Sequence):
+        # Copies keep their id so transitions copied along with them still resolve
+        if sequence.id is None or sequence.id in self._sequences_by_id:
+            sequence.id = self._next_sequence_id
+            sequence._snapshot = None
+
+        self._next_sequence_id = max(self._next_sequence_id, sequence.id + 1)
+
+        sequence._rotation = self
         self._sequences.append(sequence)
+        self._sequences_by_id[sequence.id] = sequence
+        self._ids_by_name.setdefault(sequence.name, sequence.id)
+
+        self._compiled = None
+        self._dirty = True
+
+        if self._current_index is None:
+            self._current_index = 0
+
+    def remove_sequence(self, sequence_id: int) -> Sequence:
+        sequence = self._sequences_by_id.pop(sequence_id)
+        index = self._sequences.index(sequence)
+        del self._sequences[index]
+
+        sequence._rotation = None
+        self._reindex_name(sequence.name)
+
+        # Transitions into the removed sequence go back to its name, so they are saved as they were written
+        for other in self._sequences:
+            for transition in other.transitions:
+                if transition.to == sequence_id:
+                    transition.to = sequence.name
+
+        if not self._sequences:
+            self._current_index = None
+        elif self._current_index > index:
+            self._current_index -= 1
+        elif self._current_index == index:
+            self._enter(min(index, len(self._sequences) - 1), 0)
+
+        self._compiled = None
+        self._dirty = True
+
+        return sequence
+
+    def _reindex_name(self, name: str):
+        # Only called for renames and removals, which may change which sequence is the first with this name
+        sequence_id = next((sequence.id for sequence in self._sequences if sequence.name == name), None)
+        if sequence_id is None:
+            self._ids_by_name.pop(name, None)
+        else:
+            self._ids_by_name[name] = sequence_id
+
+        self._compiled = None
+
+    def _bind(self, transition):
+        # Point a transition written against a name at that sequence's id, unknown names are left as they are
+        if not isinstance(transition.to, int):
+            sequence_id = self._ids_by_name.get(transition.to)
+            if sequence_id is not None:
+                transition._to = sequence_id
+                transition._snapshot = None
+
+    def _bind_transitions(self):
+        for sequence in self._sequences:
+            for transition in sequence.transitions:
+                self._bind(transition)
+
+        self._compiled = None
+
+    def sequence(self, sequence_id: int) -> Sequence:
+        return self._sequences_by_id.get(sequence_id)
+
+    def sequence_id(self, name: str) -> int:
+        return self._ids_by_name.get(name)
+
+    def sequence_by_name(self, name: str) -> Sequence:
+        return self._sequences_by_id.get(self._ids_by_name.get(name))
 
-        if not self.current_sequence:
-            self.current_sequence = sequence
+    def sequence_name(self, to) -> str:
+        # Name of a transition target, whether it is bound to an id or still a name
+        if isinstance(to, int):
+            sequence = self._sequences_by_id.get(to)
+            return sequence.name if sequence else None
+
+        return to
+
+    def compile(self) -> CompiledRotation:
+        self._compiled = CompiledRotation(self._sequences)
+        return self._compiled
+
+    def _enter(self, sequence_index: int, position: int):
+        self._current_index = sequence_index
+        self._sequences[sequence_index].on_enter(position=position)
 
     def transition(self, event: str or None) -> bool:
-        for transition in self.current_sequence.transitions:
-            if transition.matches(event):
-                self.current_sequence = next((sequence for sequence in self._sequences if sequence.name == transition.to))
-                self.current_sequence.on_enter(position=transition.to_position)
-                return True
+        if self._current_index is None:
+            return False
+
+        compiled = self._compiled or self.compile()
+        event_id = compiled.event_ids.get(event)
+        if event_id is None:
+            return False
 
-        return False
+        return self._transition(compiled, event_id)
+
+    def _transition(self, compiled: CompiledRotation, event_id: int) -> bool:
+        target = compiled.transitions[self._current_index].get(event_id)
+        if target is None:
+            return False
+
+        self._enter(*target)
+        return True
 
     def on_control_pressed(self, control: str) -> bool:
-        if not self.current_sequence:
-            return
+        if self._current_index is None:
+            return False
+
+        compiled = self._compiled or self.compile()
+        event_id = compiled.event_ids.get(control)
+        if event_id is None:
+            return False
 
-        current_action = self.current_sequence.actions[self.current_sequence.position]
-        if control == current_action:
-            self.current_sequence.position += 1
+        sequence = self._sequences[self._current_index]
+        actions = compiled.actions[self._current_index]
 
-            if self.current_sequence.position >= len(self.current_sequence.actions):
-                self.transition('complete')
+        if sequence.position < len(actions) and actions[sequence.position] == event_id:
+            sequence.position += 1
+
+            if sequence.position >= len(actions):
+                self._transition(compiled, CompiledRotation.COMPLETE)
 
             return True
 
         # Attempt to transition in case of matching action
-        return self.transition(control)
+        return self._transition(compiled, event_id)
 
     def next(self):
-        next_index = (self._sequences.index(self.current_sequence) + 1) % len(self._sequences)
-        self.current_sequence = self._sequences[next_index]
+        self._current_index = (self._current_index + 1) % len(self._sequences)
 
     def reset(self):
-        self.current_sequence = self._sequences[0]
-        self.current_sequence.on_enter(0)
+        self._enter(0, 0)
 
     def reset_sequence(self):
         self.current_sequence.on_enter(0)
 
+    def snapshot(self) -> tuple:
+        return tuple(sequence.snapshot() for sequence in self._sequences)
+
+    def restore(self, snapshot: tuple):
+        # Sequences that are already in the snapshot's state are kept as they are, the rest are rebuilt from it
+        current_sequence = self.current_sequence
+
+        sequences = []
+        for sequence_snapshot in snapshot:
+            sequence = self._sequences_by_id.get(sequence_snapshot[0])
+            if sequence is None or sequence.snapshot() is not sequence_snapshot:
+                sequence = Sequence.from_snapshot(sequence_snapshot)
+
+            sequences.append(sequence)
+
+        for sequence in self._sequences:
+            sequence._rotation = None
+
+        self._sequences = []
+        self._sequences_by_id = {}
+        self._ids_by_name = {}
+        self._current_index = None
+
+        for sequence in sequences:
+            self.add_sequence(sequence)
+
+        self._dirty = True
+
+        compiled = self.compile()
+        if current_sequence is not None and current_sequence.id in compiled.sequence_indices_by_id:
+            sequence_index = compiled.sequence_indices_by_id[current_sequence.id]
+            self._enter(sequence_index, min(current_sequence.position, len(compiled.actions[sequence_index])))
+
+    def copy(self):
+        rotation = Rotation()
+        for sequence in self._sequences:
+            rotation.add_sequence(sequence.copy())
+
+        rotation._current_index = self._current_index
+        rotation._dirty = self._dirty
+        rotation._saved_path = self._saved_path
+        rotation.compile()
+
+        return rotation
+
+    def take_state_from(self, other):
+        # Continue from where another rotation was, as long as its current sequence still exists here. Sequence ids
+        # are only meaningful between copies of the same file, anything else is matched by name.
+        current_sequence = other.current_sequence
+        if current_sequence is None:
+            return
+
+        compiled = self._compiled or self.compile()
+
+        sequence_index = None
+        if self._saved_path is not None and self._saved_path == other._saved_path:
+            sequence_index = compiled.sequence_indices_by_id.get(current_sequence.id)
+
+        if sequence_index is None:
+            sequence_index = compiled.sequence_indices_by_name.get(current_sequence.name)
+
+        if sequence_index is None:
+            if self._sequences:
+                self.reset()
+            return
+
+        self._enter(sequence_index, min(current_sequence.position, len(compiled.actions[sequence_index])))
+
     @property
     def action(self):
         try:
@@ -98,42 +437,159 @@ class Rotation(object):
         except AttributeError:
             return None
 
+    @property
+    def dirty(self) -> bool:
+        return self._dirty or any(sequence.dirty for sequence in self._sequences)
+
+    def mark_clean(self):
+        self._dirty = False
+        for sequence in self._sequences:
+            sequence.mark_clean()
+
+    def _mark_saved(self, file_path, snapshot=None):
+        # Edits made while a background write was pending are not in the file, the rotation stays dirty for them
+        if snapshot is not None:
+            current = self.snapshot()
+            if len(current) != len(snapshot) or any(a is not b for a, b in zip(current, snapshot)):
+                return
+
+        self.mark_clean()
+        self._saved_path = file_path
+
     def to_dict(self):
-        return [sequence.to_dict() for sequence in self._sequences]
+        # Files keep referring to sequences by name, ids only live as long as the rotation
+        sequence_names = {sequence.id: sequence.name for sequence in self._sequences}
+        return [sequence.to_dict(sequence_names) for sequence in self._sequences]
 
     @staticmethod
     def from_dict(data):
-        sequences = [Sequence.from_dict(seq_data) for seq_data in data]
         state_machine = Rotation()
-        state_machine._sequences = sequences
-        state_machine.current_sequence = sequences[0]
+        for seq_data in data:
+            state_machine.add_sequence(Sequence.from_dict(seq_data))
+
+        # Bound once every sequence exists, transitions may point at sequences further down the file
+        state_machine._bind_transitions()
+        state_machine.compile()
 
         return state_machine
 
-    def save_to_file(self, file_path):
-        with open(file_path, 'w') as file:
-            json.dump(self.to_dict(), file, indent=4)
+    def save_to_file(self, file_path, force=False, writer=None):
+        if not force and not self.dirty and file_path == self._saved_path:
+            return False
+
+        # Serialized here so the writer gets a snapshot, later edits can't change what ends up on disk. Packed
+        # files are packed again rather than overwritten with JSON.
+        if file_path.lower().endswith(PACKED_EXTENSION):
+            from .rotation_pack import pack
+            data = pack(self)
+        else:
+            data = json.dumps(self.to_dict(), indent=4)
+
+        # Only marked clean once the file is on disk, a failed write leaves the rotation dirty so it is saved again
+        if writer:
+            snapshot = self.snapshot()
+            writer.write(file_path, data, on_success=lambda: self._mark_saved(file_path, snapshot))
+        else:
+            atomic_write(file_path, data)
+            self._mark_saved(file_path)
+
+        return True
 
     @staticmethod
     def load_from_file(file_path):
-        with open(file_path, 'r') as file:
-            data = json.load(file)
-            return Rotation.from_dict(data)
+        with open(file_path, 'rb') as file:
+            packed = file.read(len(PACKED_MAGIC)) == PACKED_MAGIC
+
+        if packed:
+            from .rotation_pack import PackedRotation
+
+            with PackedRotation(file_path) as packed_rotation:
+                rotation = packed_rotation.to_rotation()
+        else:
+            with open(file_path, 'r') as file:
+                rotation = Rotation.from_dict(json.load(file))
+
+        rotation.mark_clean()
+        rotation._saved_path = file_path
+
+        return rotation
 
 
 class Transition(object):
-    def __init__(self, to: Sequence, on: str, to_position: int = 0) -> None:
-        self.to: Sequence = to
-        self.on: str = on
+    # to is the id of the target sequence once the transition belongs to a rotation that has it, otherwise its name
+    def __init__(self, to: int or str, on: str, to_position: int = 0) -> None:
+        self._to: int or str = to
+        self._on: str = on
+
+        self._to_position: int = to_position
 
-        self.to_position: int = to_position
+        self.dirty = False
+        self._snapshot: tuple = None
+
+        # Sequence the transition belongs to, told about edits so its rotation recompiles
+        self._sequence: Sequence = None
+
+    def _changed(self):
+        self.dirty = True
+        self._snapshot = None
+
+        if self._sequence is not None:
+            self._sequence._invalidate_compiled()
+
+    @property
+    def to(self) -> int or str:
+        return self._to
+
+    @to.setter
+    def to(self, to: int or str):
+        if to != self._to:
+            self._to = to
+            self._changed()
+
+    @property
+    def on(self) -> str:
+        return self._on
+
+    @on.setter
+    def on(self, on: str):
+        if on != self._on:
+            self._on = on
+            self._changed()
+
+    @property
+    def to_position(self) -> int:
+        return self._to_position
+
+    @to_position.setter
+    def to_position(self, to_position: int):
+        if to_position != self._to_position:
+            self._to_position = to_position
+            self._changed()
+
+    def mark_clean(self):
+        self.dirty = False
 
     def matches(self, event) -> bool:
         return event == self.on
 
-    def to_dict(self):
+    def snapshot(self) -> tuple:
+        if self._snapshot is None:
+            self._snapshot = (self._to, self._on, self._to_position)
+
+        return self._snapshot
+
+    @staticmethod
+    def from_snapshot(snapshot):
+        transition = Transition(*snapshot)
+        transition._snapshot = snapshot
+        return transition
+
+    def copy(self):
+        return Transition(self.to, self.on, self.to_position)
+
+    def to_dict(self, sequence_names=None):
         return {
-            'to': self.to,
+            'to': sequence_names.get(self.to, self.to) if sequence_names and isinstance(self.to, int) else self.to,
             'on': self.on,
             'to_position': self.to_position
         }
@@ -0,0 +1,106 @@
+import atexit
+import os
+import tempfile
+import threading
+
+
+def atomic_write(file_path, data, mode=None):
+    # Write next to the target and rename over it, a crash mid write leaves the previous file untouched.
+    # Bytes are written in binary mode unless a mode is given.
+    if mode is None:
+        mode = 'wb' if isinstance(data, bytes) else 'w'
+
+    directory = os.path.dirname(os.path.abspath(file_path))
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+
+    try:
+        with os.fdopen(file_descriptor, mode) as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+
+        # Keep the permissions of the file being replaced, mkstemp creates it private to the user
+        try:
+            os.chmod(temp_path, os.stat(file_path).st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+_background_writer = None
+_background_writer_lock = threading.Lock()
+
+
+def get_background_writer():
+    global _background_writer
+
+    with _background_writer_lock:
+        if _background_writer is None:
+            _background_writer = BackgroundWriter()
+
+    return _background_writer
+
+
+class BackgroundWriter(object):
+    # Writes files atomically on a worker thread. Writes queued for the same path before the worker gets to them
+    # are coalesced, only the latest data is written.
+    def __init__(self):
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._busy = False
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name='background-writer', daemon=True)
+        self._thread.start()
+
+        atexit.register(self.close)
+
+    def write(self, file_path, data, on_success=None, on_error=None):
+        with self._condition:
+            self._pending[file_path] = (data, on_success, on_error)
+            self._condition.notify_all()
+
+    def flush(self):
+        with self._condition:
+            while self._pending or self._busy:
+                self._condition.wait()
+
+    def close(self):
+        self.flush()
+
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+
+                if not self._pending:
+                    return
+
+                file_path, (data, on_success, on_error) = self._pending.popitem()
+                self._busy = True
+
+            # Any failure is reported and the worker carries on, flush() must never be left waiting on it
+            try:
+                atomic_write(file_path, data)
+                if on_success:
+                    on_success()
+            except Exception as e:
+                print(f"Failed to write {file_path}: {e}")
+                if on_error:
+                    on_error(e)
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
@@ -0,0 +1,12 @@
+import ctypes
+import ctypes.wintypes
+
+
+user32 = ctypes.windll.user32
+user32.GetKeyboardLayout.argtypes = [ctypes.wintypes.DWORD]
+user32.GetKeyboardLayout.restype = ctypes.wintypes.HKL
+
+
+def get_keyboard_layout():
+    # Input locale of the calling thread, language id in the low word and the physical layout in the high word
+    return format(user32.GetKeyboardLayout(0) or 0, 'x')
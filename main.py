@@ -2,27 +2,29 @@ import sys
 from functools import partial
 from threading import Thread
 
-from PySide6.QtCore import QObject, Slot, Signal
-from PySide6.QtWidgets import QApplication
+from core.profiling import latency, startup
 
-import qdarktheme
+with startup.phase('import qt'):
+    from PySide6.QtCore import QObject, QTimer, Slot, Signal
+    from PySide6.QtWidgets import QApplication
 
-from core import (
-    config,
-    FocusHook, get_screen_by_window_title,
-    Rotation
-)
+with startup.phase('import core'):
+    from core import (
+        config,
+        FocusHook, get_screen_by_window_title,
+        Rotation
+    )
 
-from core.constants import (
-    GW2_WINDOW_TITLE,
-    GW2RH_WINDOW_TITLE,
-)
+    from core.constants import (
+        GW2_WINDOW_TITLE,
+        GW2RH_WINDOW_TITLE,
+    )
 
-from ui import (
-    ActionHighlighter,
-    ControlsHandler, RotationEditor
-)
-from ui.style import global_style_sheet
+with startup.phase('import ui'):
+    from ui import (
+        ActionHighlighter,
+        ControlsHandler
+    )
 
 
 class RotationHelper(QObject):
@@ -31,35 +33,42 @@ class RotationHelper(QObject):
     def __init__(self, parent=None) -> None:
         super().__init__(parent=parent)
 
-        self._screen = get_screen_by_window_title(GW2_WINDOW_TITLE)
+        with startup.phase('find screen'):
+            self._screen = get_screen_by_window_title(GW2_WINDOW_TITLE)
 
-        try:
-            self._state_machine = Rotation.load_from_file(config.rotation_file_path)
-        except FileNotFoundError:
-            self._state_machine = Rotation()
-
-        self._controls_handler = ControlsHandler(config.controls, self)
-        self._controls_handler.on_control_pressed.connect(self._handle_control_pressed)
-
-        initial_sequence_name = self._state_machine.current_sequence.name if self._state_machine.current_sequence else "No Rotation"
-        self._highlighter = ActionHighlighter(
-            action=self._state_machine.action,
-            screen=self._screen,
-            label=initial_sequence_name
-        )
+        with startup.phase('load rotation'):
+            try:
+                self._state_machine = Rotation.load_from_file(config.rotation_file_path)
+            except FileNotFoundError:
+                self._state_machine = Rotation()
+
+        with startup.phase('controls hook'):
+            self._controls_handler = ControlsHandler(config.controls, self)
+            self._controls_handler.on_control_pressed.connect(self._handle_control_pressed)
+
+        with startup.phase('overlay'):
+            initial_sequence_name = self._state_machine.current_sequence.name if self._state_machine.current_sequence else "No Rotation"
+            self._highlighter = ActionHighlighter(
+                action=self._state_machine.action,
+                screen=self._screen,
+                label=initial_sequence_name
+            )
 
         self._rotation_editor = None
+        self._editor_theme_applied = False
 
         self._last_focused_window = ""
 
-        self._focus_hook: FocusHook = FocusHook(partial(RotationHelper._on_focus_callback, self))
-        self._start_focus_hook()
+        with startup.phase('focus hook'):
+            self._focus_hook: FocusHook = FocusHook(partial(RotationHelper._on_focus_callback, self))
+            self._start_focus_hook()
 
         self._hotkey_actions = {
             'toggle_rotation_editor': self._toggle_rotation_editor,
             'reset_rotation': self._reset_rotation,
             'reset_sequence': self._reset_sequence,
-            'next_sequence': self._next_sequence
+            'next_sequence': self._next_sequence,
+            'dump_latency': self._dump_latency
         }
 
         self.focus_changed.connect(self._on_focus_changed)
@@ -74,6 +83,11 @@ class RotationHelper(QObject):
 
     @Slot(str)
     def _on_focus_changed(self, window):
+        if window == GW2_WINDOW_TITLE:
+            # The game may have moved monitor or changed resolution, the highlighter only rebuilds its geometry if so
+            self._screen = get_screen_by_window_title(GW2_WINDOW_TITLE)
+            self._highlighter.set_screen(self._screen)
+
         if window == GW2RH_WINDOW_TITLE and self._last_focused_window != GW2_WINDOW_TITLE:
             self._highlighter.hide()
         elif window in [GW2_WINDOW_TITLE, GW2RH_WINDOW_TITLE]:
@@ -85,15 +99,20 @@ class RotationHelper(QObject):
 
     @Slot(str)
     def _handle_control_pressed(self, control):
+        latency.mark('signal')
+
         if not self._state_machine:
+            latency.cancel()
             return
 
         state_changed = self._state_machine.on_control_pressed(control)
+        latency.mark('rotation')
 
         if state_changed:
-            self._highlighter.highlight = self._state_machine.action
-            self._highlighter.label = self._state_machine.current_sequence.name
+            self._update_highlighter()
         else:
+            # Nothing will be repainted for this input
+            latency.cancel()
             try:
                 self._hotkey_actions[control]()
             except KeyError:
@@ -104,21 +123,39 @@ class RotationHelper(QObject):
 
     def _next_sequence(self):
         self._state_machine.next()
-        self._highlighter.highlight = self._state_machine.action
-        self._highlighter.label = self._state_machine.current_sequence.name
+        self._update_highlighter()
 
     def _reset_rotation(self):
         self._state_machine.reset()
-        self._highlighter.highlight = self._state_machine.action
-        self._highlighter.label = self._state_machine.current_sequence.name
+        self._update_highlighter()
 
     def _reset_sequence(self):
         self._state_machine.reset_sequence()
+        self._update_highlighter()
+
+    def _update_highlighter(self):
+        current_sequence = self._state_machine.current_sequence
+
         self._highlighter.highlight = self._state_machine.action
-        self._highlighter.label = self._state_machine.current_sequence.name
+        self._highlighter.label = current_sequence.name if current_sequence else "No Rotation"
+
+    def _apply_editor_theme(self):
+        # The theme only matters to the editor, the overlay paints itself. Applied on first open to keep
+        # qdarktheme and its assets out of startup.
+        if self._editor_theme_applied:
+            return
+
+        import qdarktheme
+        from ui.style import global_style_sheet
+
+        qdarktheme.setup_theme(additional_qss=global_style_sheet)
+        self._editor_theme_applied = True
 
     def _toggle_rotation_editor(self):
         if not self._rotation_editor:
+            from ui import RotationEditor
+
+            self._apply_editor_theme()
             self._rotation_editor = RotationEditor()
 
             self._rotation_editor.show()
@@ -131,29 +168,38 @@ class RotationHelper(QObject):
             self._rotation_editor.close()
             self._rotation_editor = None
 
+    def _dump_latency(self):
+        if latency.enabled:
+            print(latency.report())
+
     @Slot()
     def _on_rotation_editor_closed(self):
         self._rotation_editor = None
 
-    def _on_rotation_modified(self):
-        self._highlighter.close()
+    @Slot(object)
+    def _on_rotation_modified(self, rotation):
+        # Work on a copy so further edits in the editor don't leak into the running rotation until saved
+        state_machine = rotation.copy()
+        state_machine.take_state_from(self._state_machine)
 
-        self._state_machine = Rotation.load_from_file(config.rotation_file_path)
-        self._highlighter = ActionHighlighter(
-            action=self._state_machine.action,
-            screen=self._screen,
-            label=self._state_machine.current_sequence.name
-        )
+        self._state_machine = state_machine
+        self._update_highlighter()
 
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
-    app.setApplicationName('Guild Wars 2 Rotation Helper')
+    with startup.phase('application'):
+        app = QApplication(sys.argv)
+        app.setApplicationName('Guild Wars 2 Rotation Helper')
 
-    qdarktheme.setup_theme(additional_qss=global_style_sheet)
-
-    config.load()
+    with startup.phase('config'):
+        config.load()
+        latency.enabled = config.trace_latency
 
     _main = RotationHelper(app)
+    app.aboutToQuit.connect(_main._dump_latency)
+
+    if startup.enabled:
+        # Reported once the event loop is running and the overlay has had its first chance to paint
+        QTimer.singleShot(0, lambda: print(startup.report()))
 
     app.exec()
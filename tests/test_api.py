@@ -0,0 +1,133 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from core.gw2 import api, async_api
+
+
+# Whole seconds, urllib3 ignores fractional Retry-After values
+RETRY_AFTER = 1
+
+
+class _StubApi(object):
+    # Serves /v2/<endpoint>?ids= with one {'id': ...} entity per id and records the ids of every request. The next
+    # rate_limited requests are answered with a 429 instead.
+    def __init__(self):
+        self.requests = []
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                ids = [int(entity_id) for entity_id in parse_qs(urlparse(self.path).query)['ids'][0].split(',')]
+
+                with stub._lock:
+                    stub.requests.append(ids)
+                    rate_limited = stub.rate_limited > 0
+                    stub.rate_limited -= rate_limited
+
+                if rate_limited:
+                    self.send_response(429)
+                    self.send_header('Retry-After', str(RETRY_AFTER))
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                body = json.dumps([{'id': entity_id} for entity_id in ids]).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self._server.server_port}'
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def stub_api(tmp_path, monkeypatch):
+    # The cache is opened relative to the working directory, every test starts with an empty one
+    monkeypatch.chdir(tmp_path)
+    stub = _StubApi()
+    monkeypatch.setattr(api, 'API_URL', stub.url)
+
+    yield stub
+
+    api.close()
+    async_api._session.close()
+    stub.close()
+
+
+def test_get_many_splits_ids_into_chunks(stub_api):
+    skills = api.get_skills(range(1, 451))
+
+    assert sorted(skills) == list(range(1, 451))
+    assert [len(ids) for ids in stub_api.requests] == [200, 200, 50]
+
+
+def test_get_many_fetches_only_missing_ids(stub_api):
+    api.get_skills([1, 2, 3])
+    stub_api.requests.clear()
+
+    skills = api.get_skills([2, 3, 4, 5])
+
+    assert sorted(skills) == [2, 3, 4, 5]
+    assert stub_api.requests == [[4, 5]]
+
+
+def test_rate_limited_request_is_retried(stub_api):
+    stub_api.rate_limited = 1
+
+    start = time.monotonic()
+    skills = api.get_skills([1, 2])
+
+    assert time.monotonic() - start >= RETRY_AFTER
+    assert sorted(skills) == [1, 2]
+    assert stub_api.requests == [[1, 2], [1, 2]]
+
+
+def test_async_get_many_splits_ids_into_chunks(stub_api):
+    skills = asyncio.run(async_api.AsyncClient().get_skills(range(1, 451)))
+
+    assert sorted(skills) == list(range(1, 451))
+    assert sorted(len(ids) for ids in stub_api.requests) == [50, 200, 200]
+
+
+def test_async_get_many_fetches_only_missing_ids(stub_api):
+    api.get_skills([1, 2, 3])
+    stub_api.requests.clear()
+
+    skills = asyncio.run(async_api.AsyncClient().get_skills([2, 3, 4, 5]))
+
+    assert sorted(skills) == [2, 3, 4, 5]
+    assert stub_api.requests == [[4, 5]]
+
+
+def test_async_rate_limited_request_is_retried(stub_api):
+    stub_api.rate_limited = 1
+
+    start = time.monotonic()
+    skills = asyncio.run(async_api.AsyncClient().get_skills([1, 2]))
+
+    assert time.monotonic() - start >= RETRY_AFTER
+    assert sorted(skills) == [1, 2]
+    assert stub_api.requests == [[1, 2], [1, 2]]
@@ -0,0 +1,44 @@
+import json
+import os
+import subprocess
+import sys
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous enough for a slow CI machine, an import that pulls in the network stack or reads the cache blows past it
+IMPORT_TIME_LIMIT = 1.0
+
+HEAVY_MODULES = ('requests', 'urllib3', 'sqlite3', 'PySide6', 'core.windows')
+
+_IMPORT_SCRIPT = f'''
+import json, sys, time
+
+start = time.perf_counter()
+import core.gw2.build, core.replay
+elapsed = time.perf_counter() - start
+
+print(json.dumps({{'elapsed': elapsed, 'loaded': [name for name in {HEAVY_MODULES!r} if name in sys.modules]}}))
+'''
+
+
+def _run_import(cwd):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, PYTHONDONTWRITEBYTECODE='1')
+    output = subprocess.run([sys.executable, '-c', _IMPORT_SCRIPT], cwd=cwd, env=env,
+                            capture_output=True, text=True, check=True).stdout
+
+    return json.loads(output)
+
+
+def test_import_does_not_load_heavy_modules(tmp_path):
+    assert _run_import(tmp_path)['loaded'] == []
+
+
+def test_import_does_not_create_cache(tmp_path):
+    _run_import(tmp_path)
+
+    assert not (tmp_path / 'cache.sqlite3').exists()
+
+
+def test_import_time(tmp_path):
+    assert _run_import(tmp_path)['elapsed'] < IMPORT_TIME_LIMIT
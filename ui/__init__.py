@@ -1,3 +1,11 @@
 from .action_highlighter import ActionHighlighter
 from .controls_handler import ControlsHandler
-from .rotation_editor import RotationEditor
+
+
+# The editor and its widgets aren't needed for the overlay, load them when the editor is first opened
+def __getattr__(name):
+    if name == 'RotationEditor':
+        from .rotation_editor import RotationEditor
+        return RotationEditor
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,8 +1,11 @@
 from PySide6.QtWidgets import QWidget, QLabel
-from PySide6.QtGui import QPainter, QColor, Qt
+from PySide6.QtGui import QPainter, QColor, QBrush, QPen, Qt
 from PySide6.QtCore import QRect
 
-from core.constants import ACTION_HIGHLIGHTS
+from core.constants import ACTION_IDS
+from core.profiling import latency
+
+from .highlight_geometry import highlight_geometry
 
 
 class ActionHighlighter(QWidget):
@@ -11,33 +14,74 @@ class ActionHighlighter(QWidget):
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
         self.setAttribute(Qt.WA_TranslucentBackground)
 
-        self.setFixedSize(screen[2], screen[3])
-        self.move(screen[0], screen[1])
+        # Built once and reused, painting only needs to look up the rect for the current action
+        self._brush = QBrush(QColor(0, 0, 255, 128))
+        self._pen = QPen(Qt.NoPen)
+        self._empty_rect = QRect()
 
-        self._highlight = ACTION_HIGHLIGHTS[action] if action else [0, 0, 0, 0]
+        self._screen = None
+        self._rects = ()
+        self._label_anchor = None
+
+        self._action = action
+        self._highlight = self._empty_rect
+
+        # Area repainted for the last highlight change, the latency sample ends with the paint that covers it
+        self._latency_rect = None
 
         self._sequence_label = QLabel(self)
         self._sequence_label.setText(label)
         self._sequence_label.setStyleSheet("width: 100px; background-color: rgba(0, 0, 0, 128); border: 2px solid rgba(0, 255, 0, 20); color: rgba(255, 255, 255, 200); padding: 8px; font-weight: bold; text-align: center")
 
-        # self._sequence_label.move(1229, 1225)  # Position at top-left, adjust as needed
         self._sequence_label.setAlignment(Qt.AlignCenter)
-
-        normalized_width_difference = 100 - self._sequence_label.width()
-        self._sequence_label.move(807 - normalized_width_difference, 1366)  # Position at top-left, adjust as needed
         self._sequence_label.setMinimumWidth(100)
+        self._sequence_label.adjustSize()
+
+        self.set_screen(screen)
 
         self.show()
         self.hide()
 
+    def set_screen(self, screen):
+        if tuple(screen) == self._screen:
+            return
+
+        self._screen = tuple(screen)
+        self.setFixedSize(screen[2], screen[3])
+        self.move(screen[0], screen[1])
+
+        self._rects, self._label_anchor = highlight_geometry(screen)
+        self._highlight = self._rect_for(self._action)
+        self._move_label()
+        self.update()
+
+    def _rect_for(self, action):
+        action_id = ACTION_IDS.get(action)
+        return self._rects[action_id] if action_id is not None else self._empty_rect
+
+    def _move_label(self):
+        # Right aligned to the anchor so longer sequence names grow away from the skill bar
+        self._sequence_label.move(self._label_anchor.x() - self._sequence_label.width(), self._label_anchor.y())
+
     @property
     def highlight(self):
         return self._highlight
 
     @highlight.setter
     def highlight(self, action):
-        self._highlight = ACTION_HIGHLIGHTS[action]
-        self.update()
+        self._action = action
+
+        rect = self._rect_for(action)
+        if rect == self._highlight:
+            # Nothing is repainted for this input
+            latency.cancel()
+            return
+
+        # Only the old and new squares change, don't invalidate the whole screen sized surface
+        self.update(self._highlight)
+        self.update(rect)
+        self._latency_rect = self._highlight.united(rect)
+        self._highlight = rect
 
     @property
     def label(self):
@@ -45,17 +89,23 @@ class ActionHighlighter(QWidget):
 
     @label.setter
     def label(self, label):
+        if label == self._sequence_label.text():
+            return
+
         self._sequence_label.setText(label)
         self._sequence_label.adjustSize()
-        normalized_width_difference = 100 - self._sequence_label.width()
-        self._sequence_label.move(807 + normalized_width_difference, 1366)
+        self._move_label()
 
     def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        painter.setBrush(QColor(0, 0, 255, 128))
-        painter.setPen(QColor(0, 0, 0, 0))  # Set the stroke color to blue
-
-        rect = QRect(*self._highlight)
-        painter.drawRect(rect)
+        if self._highlight.intersects(event.rect()):
+            painter = QPainter(self)
+            painter.setBrush(self._brush)
+            painter.setPen(self._pen)
+            painter.drawRect(self._highlight)
+            painter.end()
+
+        # Repaints for anything else, the label or an expose, don't close the sample
+        if self._latency_rect is not None and event.region().intersects(self._latency_rect):
+            self._latency_rect = None
+            latency.end('paint')
 
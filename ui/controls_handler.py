@@ -2,44 +2,72 @@ from PySide6.QtCore import QObject, Signal
 
 import keyboard
 
+from core.profiling import latency
+
+
+MODIFIER_KEYS = {'ctrl', 'alt', 'shift', 'cmd'}
+
 
 class ControlsHandler(QObject):
     on_control_pressed = Signal(str)
 
     def __init__(self, controls, parent=None):
         super().__init__(parent=parent)
-        self.controls = controls
+        self.controls = None
+        self._bindings = {}
 
         self.modifiers = set()
+        self._active_modifiers = frozenset()
         self.last_key = None
         self.current_key = None
 
+        self.set_controls(controls)
         self.setup_listeners()
 
+    def set_controls(self, controls):
+        bindings = {}
+        for control in controls:
+            modifiers = frozenset(control.modifiers)
+            for scan_code in control.scan_codes or ():
+                # Earlier controls take precedence when two controls share a chord
+                bindings.setdefault((modifiers, scan_code), control.name)
+
+        self.controls = controls
+        self._bindings = bindings
+
     def setup_listeners(self):
         keyboard.hook(self.on_event)
 
     def on_event(self, event):
         key = event.name
-        scan_code = event.scan_code
 
         if event.event_type == keyboard.KEY_DOWN:
-            if key in {'ctrl', 'alt', 'shift', 'cmd'}:
-                self.modifiers.add(key)
+            if key in MODIFIER_KEYS:
+                if key not in self.modifiers:
+                    self.modifiers.add(key)
+                    self._active_modifiers = frozenset(self.modifiers)
             else:
+                latency.begin()
+
                 self.last_key = self.current_key
-                self.current_key = scan_code
+                self.current_key = event.scan_code
 
                 if self.last_key != self.current_key:
                     self.check_input()
+                else:
+                    latency.cancel()
         elif event.event_type == keyboard.KEY_UP:
-            if key in {'ctrl', 'alt', 'shift', 'cmd'}:
-                self.modifiers.discard(key)
+            if key in MODIFIER_KEYS:
+                if key in self.modifiers:
+                    self.modifiers.discard(key)
+                    self._active_modifiers = frozenset(self.modifiers)
             else:
                 self.current_key = None
 
     def check_input(self):
-        for control in self.controls:
-            if self.modifiers == control.modifiers and self.current_key in control.scan_codes:
-                self.on_control_pressed.emit(control.name)
-                break
+        control = self._bindings.get((self._active_modifiers, self.current_key))
+        if control is not None:
+            latency.mark('hook')
+            self.on_control_pressed.emit(control)
+        else:
+            latency.cancel()
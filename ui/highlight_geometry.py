@@ -0,0 +1,21 @@
+from functools import lru_cache
+
+from PySide6.QtCore import QPoint, QRect
+
+from core import config
+from core.constants import calculate_highlight_regions, calculate_label_anchor
+
+
+@lru_cache(maxsize=8)
+def _geometry(resolution, interface_size):
+    width, height = resolution
+
+    rects = tuple(QRect(*region) for region in calculate_highlight_regions(width, height, interface_size))
+    return rects, QPoint(*calculate_label_anchor(width, height, interface_size))
+
+
+def highlight_geometry(screen):
+    # Ready to paint rects indexed by ACTION_IDS and the label anchor, computed once per game resolution and
+    # interface size. The game resolution is the monitor the game is on unless settings.ini overrides it.
+    resolution = tuple(config.resolution) if config.resolution else (screen[2], screen[3])
+    return _geometry(resolution, config.interface_size)
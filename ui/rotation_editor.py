@@ -1,15 +1,19 @@
 import sys
 
-import qdarktheme
 from PySide6.QtGui import QAction
-from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QListWidget,
-                               QPushButton, QLineEdit, QComboBox, QTableWidget, QTableWidgetItem,
+from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QListWidget, QListView,
+                               QPushButton, QLineEdit, QComboBox, QTableView,
                                QLabel, QListWidgetItem, QSplitter, QSizePolicy, QStyledItemDelegate, QHeaderView,
-                               QFrame, QGraphicsDropShadowEffect, QMenu, QFileDialog)
-from PySide6.QtCore import Qt, QEvent, Signal, Slot
+                               QFrame, QGraphicsDropShadowEffect, QMenu, QFileDialog, QInputDialog)
+from PySide6.QtCore import Qt, QStringListModel, QTimer, Signal
 
 from core import Transition, Sequence, Rotation, config
-from core.constants import ACTION_NAMES
+from core.library import RotationLibrary
+from core.constants import ACTION_IDS, ACTION_NAMES
+from core.history import History
+from core.utils import get_background_writer
+from ui.rotation_models import ActionListModel, SequenceNameModel, TransitionTableModel
+from ui.style import global_style_sheet
 
 
 # class Sequence:
@@ -29,7 +33,16 @@ from core.constants import ACTION_NAMES
 # class StateMachine:
 #     def __init__(self):
 #         self.sequences = []
-from ui.style import global_style_sheet
+
+
+# Packed rotations are saved packed again, see Rotation.save_to_file
+ROTATION_FILE_FILTER = "JSON Files (*.json);;Packed Rotations (*.gw2r)"
+
+# Quiet period after the last edit before an autosave is written
+AUTOSAVE_DELAY_MS = 1500
+
+# Recorded actions reach the action list at most this often, about 30 times a second
+RECORD_FLUSH_INTERVAL_MS = 33
 
 
 class CustomItemDelegate(QStyledItemDelegate):
@@ -40,13 +53,14 @@ class CustomItemDelegate(QStyledItemDelegate):
 
 
 class ComboBoxDelegate(QStyledItemDelegate):
-    def __init__(self, items, parent=None):
+    def __init__(self, model, parent=None):
         super().__init__(parent)
-        self.items = items
+        self.model = model
 
     def createEditor(self, parent, option, index):
+        # Editors share the delegate's model, nothing is copied per editor or when the model changes
         combo = QComboBox(parent)
-        combo.addItems(self.items)
+        combo.setModel(self.model)
         combo.currentIndexChanged.connect(lambda: self.commitData.emit(combo))
         return combo
 
@@ -59,56 +73,11 @@ class ComboBoxDelegate(QStyledItemDelegate):
         model.setData(index, editor.currentText(), Qt.DisplayRole)
 
 
-class EditableComboBoxItem(QWidget):
-    valueChanged = Signal(str)
-
-    def __init__(self, actions, initial_text, parent=None):
-        super().__init__(parent)
-        self.layout = QHBoxLayout(self)
-        self.label = QLabel(initial_text)
-        self.combo = QComboBox()
-        self.combo.addItems(actions)
-        self.combo.setVisible(False)
-        self.combo.setStyleSheet("""
-            QComboBox {
-                background-color: #444444;
-                color: white;
-                padding: 5px;
-                border-radius: 5px;
-            }
-            QComboBox QAbstractItemView {
-                background-color: #555555;
-                color: white;
-            }
-        """)
-        self.combo.setMinimumHeight(40)  # Set the height to match the list item height
-
-        self.layout.addWidget(self.label)
-        self.layout.addWidget(self.combo)
-        self.layout.setContentsMargins(0, 0, 0, 0)
-        self.setLayout(self.layout)
-
-        self.label.mouseDoubleClickEvent = self.edit_item
-        self.combo.activated.connect(self.finish_edit)
-        self.combo.installEventFilter(self)
-
-    def edit_item(self, event):
-        self.label.setVisible(False)
-        self.combo.setVisible(True)
-        self.combo.setCurrentText(self.label.text())
-        self.combo.setFocus()
-
-    def finish_edit(self):
-        self.label.setText(self.combo.currentText())
-        self.label.setVisible(True)
-        self.combo.setVisible(False)
-        self.valueChanged.emit(self.combo.currentText())
-
-    def eventFilter(self, obj, event):
-        if obj == self.combo:
-            if event.type() == QEvent.FocusOut and not self.combo.view().hasFocus():
-                self.finish_edit()
-        return super().eventFilter(obj, event)
+class ActionItemDelegate(ComboBoxDelegate):
+    def sizeHint(self, option, index):
+        size = super().sizeHint(option, index)
+        size.setHeight(40)  # Match the height of the sequence list items
+        return size
 
 
 class SequenceListWidget(QListWidget):
@@ -125,7 +94,7 @@ class SequenceListWidget(QListWidget):
 
 
 class RotationEditor(QWidget):
-    rotation_changed = Signal()
+    rotation_changed = Signal(object)
 
     def __init__(self):
         super().__init__()
@@ -139,8 +108,12 @@ class RotationEditor(QWidget):
         # Widgets
         self.record_button = None
         self.transition_table = None
+        self._transition_model = None
+        self._sequence_name_model = None
+        self._event_name_model = None
         self.action_combo = None
         self.action_list = None
+        self._action_model = None
         self._sequence_list = None
         self.sequence_name_le = None
 
@@ -150,8 +123,26 @@ class RotationEditor(QWidget):
         #
         self.file_path = None
         self.record_actions = False
+        self.library = None
+
+        self._writer = get_background_writer()
+
+        # Restarted by every edit so a burst of edits ends up as a single write
+        self._autosave_timer = QTimer(self)
+        self._autosave_timer.setSingleShot(True)
+        self._autosave_timer.setInterval(AUTOSAVE_DELAY_MS)
+        self._autosave_timer.timeout.connect(self.on_autosave)
+
+        # Keypresses while recording only go into the buffer, the timer is started by the first one after a flush
+        # so however fast actions come in the view is updated once per interval
+        self._recorded_actions = []
+        self._record_flush_timer = QTimer(self)
+        self._record_flush_timer.setSingleShot(True)
+        self._record_flush_timer.setInterval(RECORD_FLUSH_INTERVAL_MS)
+        self._record_flush_timer.timeout.connect(self.flush_recorded_actions)
 
         self.state_machine = Rotation()
+        self._history = History()
 
         self.init_ui()
 
@@ -198,21 +189,39 @@ class RotationEditor(QWidget):
         open_action = QAction("Open", self, triggered=self.on_open)
         open_action.setShortcut("Ctrl+O")
 
+        open_library_action = QAction("Open From Library", self, triggered=self.on_open_from_library)
+        open_library_action.setShortcut("Ctrl+Shift+O")
+        open_library_action.setEnabled(bool(config.rotation_library_path))
+
         save_action = QAction("Save", self, triggered=self.on_save)
         save_action.setShortcut("Ctrl+S")
 
         save_as_action = QAction("Save As", self, triggered=self.on_save_as)
 
+        undo_action = QAction("Undo", self, triggered=self.on_undo)
+        undo_action.setShortcut("Ctrl+Z")
+
+        redo_action = QAction("Redo", self, triggered=self.on_redo)
+        redo_action.setShortcut("Ctrl+Y")
+
+        # Added to the window as well so the shortcuts work while the menu is closed
+        self.addAction(undo_action)
+        self.addAction(redo_action)
+
         close_action = QAction("Close", self, triggered=self.on_close)
         close_action.setShortcut("Ctrl+W")
 
         menu.addAction(new_action)
         menu.addSeparator()
         menu.addAction(open_action)
+        menu.addAction(open_library_action)
         menu.addSeparator()
         menu.addAction(save_action)
         menu.addAction(save_as_action)
         menu.addSeparator()
+        menu.addAction(undo_action)
+        menu.addAction(redo_action)
+        menu.addSeparator()
         menu.addAction(close_action)
         menu_button.setMenu(menu)
 
@@ -254,9 +263,15 @@ class RotationEditor(QWidget):
         self.record_button.setProperty("flat", True)
         self.record_button.clicked.connect(self.toggle_recording)
 
-        self.action_list = QListWidget()
+        # Rows are painted by the delegate, a combo box only exists while a row is being edited
+        self._action_model = ActionListModel(self)
+        self._action_model.dataChanged.connect(lambda *_: self.on_edited())
+
+        self.action_list = QListView()
         self.action_list.setObjectName("action_list")
-        self.action_list.setItemDelegate(CustomItemDelegate(self.action_list))
+        self.action_list.setUniformItemSizes(True)
+        self.action_list.setModel(self._action_model)
+        self.action_list.setItemDelegate(ActionItemDelegate(QStringListModel(ACTION_NAMES, self), self.action_list))
 
         self.action_combo = QComboBox()
         self.action_combo.addItems(ACTION_NAMES)  # Add your predefined actions here
@@ -287,18 +302,24 @@ class RotationEditor(QWidget):
         transition_title_lb = QLabel("Transitions")
         transition_title_lb.setStyleSheet("font-size: 14px; font-weight: bold; color: #aaaaaa; padding: 10px")
 
-        self.transition_table = QTableWidget(0, 3)
-        self.transition_table.setHorizontalHeaderLabels(["To", "On", "To Position"])
+        self._transition_model = TransitionTableModel(self)
+        self._transition_model.dataChanged.connect(lambda *_: self.on_edited())
+
+        self.transition_table = QTableView()
+        self.transition_table.setModel(self._transition_model)
         self.transition_table.horizontalHeader().setStretchLastSection(True)
         self.transition_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
 
-        # Create and set delegates for "To" and "On" columns
-        self.to_delegate = ComboBoxDelegate(self.sequence_names())
-        self.on_delegate = ComboBoxDelegate(["complete"] + ACTION_NAMES)
+        # "To" reads the live sequence names, "On" the fixed list of events
+        self._sequence_name_model = SequenceNameModel(self)
+        self._sequence_name_model.set_rotation(self.state_machine)
+        self._event_name_model = QStringListModel(["complete"] + ACTION_NAMES, self)
+
+        self.to_delegate = ComboBoxDelegate(self._sequence_name_model)
+        self.on_delegate = ComboBoxDelegate(self._event_name_model)
 
         self.transition_table.setItemDelegateForColumn(0, self.to_delegate)
         self.transition_table.setItemDelegateForColumn(1, self.on_delegate)
-        self.transition_table.cellChanged.connect(self.on_transition_table_cell_changed)
 
         add_transition_button = QPushButton("Add")
         add_transition_button.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
@@ -329,12 +350,13 @@ class RotationEditor(QWidget):
         for sequence in self.state_machine._sequences:
             item = QListWidgetItem(sequence.name)
             item.setFlags(item.flags() | Qt.ItemIsEditable)
-            item.setData(Qt.UserRole, sequence.name)
+            item.setData(Qt.UserRole, sequence.id)
             self._sequence_list.addItem(item)
-        self.action_list.clear()
-        self.transition_table.setRowCount(0)
+        self.update_action_list(None)
+        self._transition_model.set_sequence(None)
 
     def toggle_recording(self):
+        self.flush_recorded_actions()
         self.record_actions = not self.record_actions
         self.record_button.setText('Stop Recording' if self.record_actions else 'Record')
 
@@ -348,61 +370,136 @@ class RotationEditor(QWidget):
         if config.rotation_file_path:
             self.state_machine = Rotation.load_from_file(config.rotation_file_path)
             self.file_path = config.rotation_file_path
-            self.to_delegate.items = self.sequence_names()
+            self._sequence_name_model.set_rotation(self.state_machine)
+            self._history.reset(self.state_machine)
             self.update_window_title()
             self.update_ui()
-
-            if self._sequence_list.count() > 0:
-                first_item = self._sequence_list.item(0)
-                self._sequence_list.setCurrentItem(first_item)
-                self.on_sequence_selected(first_item)
+            self.select_sequence(None)
 
     def on_new(self):
         self.state_machine = Rotation()
+        self._sequence_name_model.set_rotation(self.state_machine)
+        self._history.reset(self.state_machine)
         self._sequence_list.clear()
-        self.action_list.clear()
-        self.transition_table.setRowCount(0)
+        self.update_action_list(None)
+        self._transition_model.set_sequence(None)
         self.file_path = None
         self.update_window_title()
 
     def on_save(self):
         if self.file_path:
-            self.state_machine.save_to_file(self.file_path)
-            config.rotation_file_path = self.file_path
-            config.save()
-            self.rotation_changed.emit()
-            print(f"State machine saved to {self.file_path}")
+            self.save()
         else:
             self.on_save_as()
 
     def on_save_as(self):
-        file_path, _ = QFileDialog.getSaveFileName(self, "Save Rotation", "", "JSON Files (*.json)")
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save Rotation", "", ROTATION_FILE_FILTER)
         if file_path:
-            self.state_machine.save_to_file(file_path)
             self.file_path = file_path
             self.update_window_title()
+            self.save()
+
+    def save(self):
+        self._autosave_timer.stop()
+        self.flush_recorded_actions()
+
+        # Nothing is written when the rotation hasn't changed since it was loaded or last saved
+        if self.state_machine.save_to_file(self.file_path, writer=self._writer):
+            self.remember_file_path()
+            self.rotation_changed.emit(self.state_machine)
+            print(f"State machine saved to {self.file_path}")
+
+    def on_autosave(self):
+        if self.file_path:
+            self.save()
+
+    def on_edited(self, record=True):
+        if record:
+            self._history.record(self.state_machine)
+
+        if config.autosave:
+            self._autosave_timer.start()
+
+    def on_undo(self):
+        self.restore_history(self._history.undo)
+
+    def on_redo(self):
+        self.restore_history(self._history.redo)
+
+    def restore_history(self, step):
+        # Buffered recordings become their own step first, so they are the first thing undone
+        self.flush_recorded_actions()
+
+        selected_sequence = self._action_model.sequence
+        if not step(self.state_machine):
+            return
+
+        self._sequence_name_model.set_rotation(self.state_machine)
+        self.update_ui()
+        self.select_sequence(selected_sequence.id if selected_sequence else None)
+        self.on_edited(record=False)
+
+    def select_sequence(self, sequence_id):
+        # Falls back to the first sequence when the one asked for doesn't exist (anymore)
+        if self._sequence_list.count() == 0:
+            return
+
+        item = self._sequence_list.item(0)
+        for row in range(self._sequence_list.count()):
+            if self._sequence_list.item(row).data(Qt.UserRole) == sequence_id:
+                item = self._sequence_list.item(row)
+                break
+
+        self._sequence_list.setCurrentItem(item)
+        self.on_sequence_selected(item)
+
+    def remember_file_path(self):
+        if config.rotation_file_path != self.file_path:
             config.rotation_file_path = self.file_path
             config.save()
-            self.rotation_changed.emit()
-            print(f"State machine saved to {file_path}")
+
+    def closeEvent(self, event):
+        self.flush_recorded_actions()
+
+        if self._autosave_timer.isActive():
+            self.on_autosave()
+
+        self._writer.flush()
+        super().closeEvent(event)
 
     def on_open(self):
-        file_path, _ = QFileDialog.getOpenFileName(self, "Open Rotation", "", "JSON Files (*.json)")
+        file_path, _ = QFileDialog.getOpenFileName(self, "Open Rotation", "", ROTATION_FILE_FILTER)
         if file_path:
-            self.state_machine = Rotation.load_from_file(file_path)
-            self.file_path = file_path
-            config.rotation_file_path = self.file_path
-            config.save()
-            self.to_delegate.items = self.sequence_names()
-            self.rotation_changed.emit()
-            self.update_window_title()
-            self.update_ui()
-            print(f"State machine loaded from {file_path}")
+            self.open_file(file_path)
+
+    def on_open_from_library(self):
+        if self.library is None:
+            self.library = RotationLibrary(config.rotation_library_path)
+
+        # Only files changed since the last refresh are parsed, everything listed comes from the index. JSON and packed
+        # rotations are both listed, the library only indexes ROTATION_EXTENSIONS.
+        self.library.refresh()
+        entries = self.library.entries()
+        if not entries:
+            return
 
-            if self._sequence_list.count() > 0:
-                first_item = self._sequence_list.item(0)
-                self._sequence_list.setCurrentItem(first_item)
-                self.on_sequence_selected(first_item)
+        labels = [f"{entry['file']}  ({len(entry['sequences'])} sequences)" for entry in entries]
+        label, accepted = QInputDialog.getItem(self, "Open From Library", "Rotation", labels, 0, False)
+        if accepted:
+            self.open_file(self.library.path(entries[labels.index(label)]))
+
+    def open_file(self, file_path):
+        self.state_machine = Rotation.load_from_file(file_path)
+        self.file_path = file_path
+        self.remember_file_path()
+        self._sequence_name_model.set_rotation(self.state_machine)
+        self._history.reset(self.state_machine)
+        self.rotation_changed.emit(self.state_machine)
+        self.update_window_title()
+        self.update_ui()
+        print(f"State machine loaded from {file_path}")
+
+        self.select_sequence(None)
 
     def on_close(self):
         self.close()
@@ -414,103 +511,78 @@ class RotationEditor(QWidget):
         sequence_name = self.sequence_name_le.text()
         if sequence_name:
             new_sequence = Sequence(sequence_name, [])
-            self.state_machine.add_sequence(new_sequence)
+            self._sequence_name_model.add_sequence(new_sequence)
 
             item = QListWidgetItem(sequence_name)
             item.setFlags(item.flags() | Qt.ItemIsEditable)
-            item.setData(Qt.UserRole, sequence_name)
+            item.setData(Qt.UserRole, new_sequence.id)
 
             self._sequence_list.addItem(item)
             self._sequence_list.setCurrentItem(item)
+            self.on_sequence_selected(item)
 
             self.sequence_name_le.clear()
-
-            self.to_delegate.items = self.sequence_names()
+            self.on_edited()
 
     def on_sequence_selected(self, item):
-        selected_sequence_name = item.text()
-        selected_sequence = next(seq for seq in self.state_machine._sequences if seq.name == selected_sequence_name)
+        selected_sequence = self.state_machine.sequence(item.data(Qt.UserRole))
         self.update_action_list(selected_sequence)
         self.update_transition_table(selected_sequence)
 
     def on_sequence_name_edited(self, item):
-        old_name = item.data(Qt.UserRole)
         new_name = item.text()
-        sequence = next(seq for seq in self.state_machine._sequences if seq.name == old_name)
-        sequence.name = new_name
-        item.setData(Qt.UserRole, new_name)
-        self.to_delegate.items = self.sequence_names()
+        if new_name == self.state_machine.sequence(item.data(Qt.UserRole)).name:
+            return
 
-    def update_action_list(self, sequence):
-        self.action_list.clear()
-        for idx, action in enumerate(sequence.actions):
-            item_widget = EditableComboBoxItem(["action1", "action2", "action3"], action)  # TODO: Add actions
-            item_widget.valueChanged.connect(lambda value, i=idx: self.update_action(sequence, i, value))
-            item = QListWidgetItem(self.action_list)
-            item.setSizeHint(item_widget.sizeHint())
-            self.action_list.setItemWidget(item, item_widget)
+        # Transitions hold the sequence id, the rename doesn't touch them. The list is built in rotation order,
+        # so its rows line up with the name model's.
+        self._sequence_name_model.rename(self._sequence_list.row(item), new_name)
+        self.on_edited()
 
-    def update_action(self, sequence, index, value):
-        sequence.actions[index] = value
+    def update_action_list(self, sequence):
+        # Anything still buffered belongs to the sequence being replaced
+        self.flush_recorded_actions()
+        self._action_model.set_sequence(sequence)
 
     def update_transition_table(self, sequence):
-        self.transition_table.setRowCount(0)
-        for transition in sequence.transitions:
-            row_position = self.transition_table.rowCount()
-            self.transition_table.insertRow(row_position)
-            self.transition_table.setItem(row_position, 0, QTableWidgetItem(transition.to))
-            self.transition_table.setItem(row_position, 1, QTableWidgetItem(transition.on))
-            self.transition_table.setItem(row_position, 2, QTableWidgetItem(str(transition.to_position)))
+        self._transition_model.set_sequence(sequence, self.state_machine)
 
     def add_action(self):
         selected_action = self.action_combo.currentText()
-        if selected_action:
-            current_item = self._sequence_list.currentItem()
-            if current_item:
-                selected_sequence_name = current_item.text()
-                selected_sequence = next(seq for seq in self.state_machine._sequences if seq.name == selected_sequence_name)
-                selected_sequence.actions.append(selected_action)
-                self.update_action_list(selected_sequence)
+        if selected_action and self._action_model.sequence:
+            self._action_model.append(selected_action)
+            self.action_list.scrollToBottom()
+            self.on_edited()
 
     def handle_control_press(self, control):
         if not self.record_actions:
             return
 
-        if control in ACTION_NAMES:
-            current_item = self._sequence_list.currentItem()
-            if current_item:
-                selected_sequence_name = current_item.text()
-                selected_sequence = next(
-                    seq for seq in self.state_machine._sequences if seq.name == selected_sequence_name)
-                selected_sequence.actions.append(control)
-                self.update_action_list(selected_sequence)
+        if control in ACTION_IDS and self._action_model.sequence:
+            self._recorded_actions.append(control)
+            if not self._record_flush_timer.isActive():
+                self._record_flush_timer.start()
 
-    def add_transition(self):
-        current_item = self._sequence_list.currentItem()
-        if current_item:
-            selected_sequence_name = current_item.text()
-            selected_sequence = next(seq for seq in self.state_machine._sequences if seq.name == selected_sequence_name)
-            new_transition = Transition(self.sequence_names()[0], "complete", 0)
-            selected_sequence.transitions.append(new_transition)
-            self.update_transition_table(selected_sequence)
-
-    @Slot(int, int)
-    def on_transition_table_cell_changed(self, row, column):
-        current_item = self._sequence_list.currentItem()
-        if not current_item:
+    def flush_recorded_actions(self):
+        self._record_flush_timer.stop()
+        if not self._recorded_actions:
             return
 
-        selected_sequence_name = current_item.text()
-        selected_sequence = next(seq for seq in self.state_machine._sequences if seq.name == selected_sequence_name)
-        if column == 0:
-            selected_sequence.transitions[row].to = self.transition_table.item(row, column).text()
-        elif column == 1:
-            selected_sequence.transitions[row].on = self.transition_table.item(row, column).text()
-        elif column == 2:
-            selected_sequence.transitions[row].to_position = int(self.transition_table.item(row, column).text())
+        recorded_actions, self._recorded_actions = self._recorded_actions, []
+        if self._action_model.sequence:
+            self._action_model.extend(recorded_actions)
+            self.action_list.scrollToBottom()
+            self.on_edited()
+
+    def add_transition(self):
+        if self._transition_model.sequence:
+            new_transition = Transition(self.state_machine._sequences[0].id, "complete", 0)
+            self._transition_model.append(new_transition)
+            self.on_edited()
 
 
 if __name__ == "__main__":
+    import qdarktheme
 
     app = QApplication(sys.argv)
     qdarktheme.setup_theme(additional_qss=global_style_sheet)
@@ -0,0 +1,191 @@
+from PySide6.QtCore import QAbstractListModel, QAbstractTableModel, QModelIndex, Qt
+
+
+class ActionListModel(QAbstractListModel):
+    # Wraps the actions of one sequence in place, views only create widgets for the row being edited
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._sequence = None
+
+    @property
+    def sequence(self):
+        return self._sequence
+
+    def set_sequence(self, sequence):
+        self.beginResetModel()
+        self._sequence = sequence
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or self._sequence is None:
+            return 0
+
+        return len(self._sequence.actions)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+
+        return self._sequence.actions[index.row()]
+
+    def flags(self, index):
+        return super().flags(index) | Qt.ItemIsEditable
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return False
+
+        if self._sequence.actions[index.row()] == value:
+            return False
+
+        self._sequence.set_action(index.row(), value)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        return True
+
+    def append(self, action):
+        row = len(self._sequence.actions)
+
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._sequence.append_action(action)
+        self.endInsertRows()
+
+    def extend(self, actions):
+        if not actions:
+            return
+
+        row = len(self._sequence.actions)
+
+        self.beginInsertRows(QModelIndex(), row, row + len(actions) - 1)
+        self._sequence.extend_actions(actions)
+        self.endInsertRows()
+
+
+class SequenceNameModel(QAbstractListModel):
+    # Live list of the rotation's sequence names, shared by every combo box that picks a sequence so a rename
+    # shows up everywhere without copying the names around
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rotation = None
+
+    def set_rotation(self, rotation):
+        self.beginResetModel()
+        self._rotation = rotation
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or self._rotation is None:
+            return 0
+
+        return len(self._rotation._sequences)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+
+        return self._rotation._sequences[index.row()].name
+
+    def add_sequence(self, sequence):
+        row = len(self._rotation._sequences)
+
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._rotation.add_sequence(sequence)
+        self.endInsertRows()
+
+    def rename(self, row, name):
+        self._rotation._sequences[row].name = name
+
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+
+
+class TransitionTableModel(QAbstractTableModel):
+    HEADERS = ("To", "On", "To Position")
+
+    # Wraps the transitions of one sequence in place, an edit only touches the cell that changed. Targets are
+    # shown and picked by name and stored as the sequence id through the rotation's index.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._sequence = None
+        self._rotation = None
+
+    @property
+    def sequence(self):
+        return self._sequence
+
+    def set_sequence(self, sequence, rotation=None):
+        self.beginResetModel()
+        self._sequence = sequence
+        self._rotation = rotation
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or self._sequence is None:
+            return 0
+
+        return len(self._sequence.transitions)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+
+        return super().headerData(section, orientation, role)
+
+    def _value(self, transition, column):
+        if column == 0:
+            return transition.to
+        if column == 1:
+            return transition.on
+
+        return transition.to_position
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+
+        value = self._value(self._sequence.transitions[index.row()], index.column())
+        if index.column() == 0:
+            return self._rotation.sequence_name(value)
+
+        return str(value) if role == Qt.DisplayRole else value
+
+    def flags(self, index):
+        return super().flags(index) | Qt.ItemIsEditable
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return False
+
+        transition = self._sequence.transitions[index.row()]
+        column = index.column()
+
+        if column == 0:
+            sequence_id = self._rotation.sequence_id(value)
+            value = sequence_id if sequence_id is not None else value
+        elif column == 2:
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                return False
+
+        if self._value(transition, column) == value:
+            return False
+
+        if column == 0:
+            transition.to = value
+        elif column == 1:
+            transition.on = value
+        else:
+            transition.to_position = value
+
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        return True
+
+    def append(self, transition):
+        row = len(self._sequence.transitions)
+
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._sequence.add_transition(transition)
+        self.endInsertRows()